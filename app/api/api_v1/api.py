@@ -1,7 +1,10 @@
 from fastapi import APIRouter
-from .endpoints import auth, houses, tasks
+from .endpoints import auth, dashboard, houses, jobs, tasks, sync
 
 api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth", tags=["authentication"])
 api_router.include_router(houses.router, prefix="/houses", tags=["houses"])
 api_router.include_router(tasks.router, prefix="/tasks", tags=["tasks"])
+api_router.include_router(dashboard.router, prefix="/dashboard", tags=["dashboard"])
+api_router.include_router(sync.router, prefix="/sync", tags=["sync"])
+api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
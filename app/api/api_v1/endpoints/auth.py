@@ -3,11 +3,14 @@ from typing import Any, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import BaseModel
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from .... import models
 from ....api import deps
 from ....core import auth
 from ....core.config import settings
+from ....db import statements
 
 router = APIRouter()
 
@@ -21,6 +24,19 @@ class LoginRequest(BaseModel):
     username: str  # email
     password: str
 
+def upgrade_password_hash(db: Session, user: models.User, new_hash: str) -> None:
+    """
+    Store a full-password hash with the configured scheme and cost after a
+    successful login
+    """
+    # Skip if the password changed since it was verified
+    db.execute(
+        update(models.User).where(
+            models.User.id == user.id, models.User.password_hash == user.password_hash
+        ).values(password_hash=new_hash, password_truncated=False)
+    )
+    db.commit()
+
 @router.post("/login")
 async def login(
     request: LoginRequest,
@@ -29,17 +45,22 @@ async def login(
     """
     JSON-based login, get an access token for future requests
     """
-    user = db.query(models.User).filter(models.User.email == request.username).first()
+    user = db.scalars(statements.user_by_email(request.username)).first()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect email or password"
         )
-    if not auth.verify_password(request.password, user.password_hash):
+    valid, new_hash = auth.verify_and_update(
+        request.password, user.password_hash, truncated=user.password_truncated
+    )
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect email or password"
         )
+    if new_hash:
+        upgrade_password_hash(db, user, new_hash)
 
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     return {
@@ -63,17 +84,22 @@ async def login_form(
     """
     OAuth2 compatible token login (form-based), get an access token for future requests
     """
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
+    user = db.scalars(statements.user_by_email(form_data.username)).first()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect email or password"
         )
-    if not auth.verify_password(form_data.password, user.password_hash):
+    valid, new_hash = auth.verify_and_update(
+        form_data.password, user.password_hash, truncated=user.password_truncated
+    )
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect email or password"
         )
+    if new_hash:
+        upgrade_password_hash(db, user, new_hash)
 
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     return {
@@ -97,26 +123,26 @@ async def register(
     """
     Create new user account
     """
-    # Check if user already exists
-    user = db.query(models.User).filter(models.User.email == request.email).first()
-    if user:
+    # Create new user; the unique email index rejects duplicates, so a
+    # single INSERT ... RETURNING both checks and writes
+    hashed_password = auth.get_password_hash(request.password)
+    try:
+        db_user = db.scalars(
+            insert(models.User).values(
+                name=request.name,
+                email=request.email,
+                phone=request.phone,
+                password_hash=hashed_password
+            ).returning(models.User)
+        ).one()
+        db.commit()
+    except IntegrityError:
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
 
-    # Create new user
-    hashed_password = auth.get_password_hash(request.password)
-    db_user = models.User(
-        name=request.name,
-        email=request.email,
-        phone=request.phone,
-        password_hash=hashed_password
-    )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-
     # Create access token
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     return {
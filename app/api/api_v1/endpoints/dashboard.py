@@ -0,0 +1,100 @@
+from typing import Any, List
+from datetime import datetime
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session, aliased
+from .... import models
+from ....api import deps
+from ....db.shards import ShardSessions, shard_router
+from .houses import member_counts_subquery, serialize_house, user_houses_filter
+from .tasks import get_assignee_names, serialize_task
+
+router = APIRouter()
+
+@router.get("")
+async def get_dashboard(
+    upcoming_limit: int = Query(3, ge=0, le=20),
+    current_user: models.User = Depends(deps.get_current_user),
+    db: Session = Depends(deps.get_db),
+    shards: ShardSessions = Depends(deps.get_shards)
+) -> Any:
+    """
+    Get the user's houses with member counts, task counts and upcoming tasks.
+
+    Uses one directory query plus two queries per shard (and one assignee
+    name lookup), regardless of how many houses the user belongs to.
+    """
+    # 1. Houses with member counts
+    member_counts = member_counts_subquery(db)
+    houses = db.query(
+        models.House,
+        func.coalesce(member_counts.c.member_count, 0)
+    ).outerjoin(
+        member_counts, member_counts.c.house_id == models.House.id
+    ).filter(
+        user_houses_filter(db, current_user.id)
+    ).all()
+
+    house_ids = [house.id for house, _ in houses]
+    if not house_ids:
+        return []
+
+    now = datetime.utcnow()
+    is_open = models.Task.completed.is_(False)
+
+    def query_shard(task_db: Session, shard_house_ids: List[int]) -> list:
+        # 2. Open/overdue task counts per house
+        task_counts = task_db.query(
+            models.Task.house_id,
+            func.sum(case((is_open, 1), else_=0)),
+            func.sum(case((is_open & (models.Task.deadline < now), 1), else_=0))
+        ).filter(
+            models.Task.house_id.in_(shard_house_ids)
+        ).group_by(models.Task.house_id).all()
+
+        # 3. Next N open tasks per house, ranked by deadline
+        upcoming = []
+        if upcoming_limit:
+            ranked = task_db.query(
+                models.Task,
+                func.row_number().over(
+                    partition_by=models.Task.house_id,
+                    order_by=(models.Task.deadline, models.Task.id)
+                ).label("position")
+            ).filter(
+                models.Task.house_id.in_(shard_house_ids),
+                is_open,
+                models.Task.deadline.isnot(None)
+            ).subquery()
+            ranked_task = aliased(models.Task, ranked)
+            upcoming = task_db.query(ranked_task).filter(
+                ranked.c.position <= upcoming_limit
+            ).order_by(ranked.c.house_id, ranked.c.position).all()
+
+        return [(task_counts, upcoming)]
+
+    counts_by_house = {}
+    upcoming_tasks = []
+    for task_counts, upcoming in await shards.fan_out(
+        shard_router.group_houses(house_ids), query_shard
+    ):
+        for house_id, open_count, overdue_count in task_counts:
+            counts_by_house[house_id] = (open_count or 0, overdue_count or 0)
+        upcoming_tasks.extend(upcoming)
+
+    assignee_names = get_assignee_names(db, upcoming_tasks)
+    upcoming_by_house = {house_id: [] for house_id in house_ids}
+    for task in upcoming_tasks:
+        upcoming_by_house[task.house_id].append(serialize_task(task, assignee_names))
+
+    result = []
+    for house, member_count in houses:
+        open_count, overdue_count = counts_by_house.get(house.id, (0, 0))
+        result.append({
+            **serialize_house(house, member_count, current_user.id),
+            "open_tasks_count": open_count,
+            "overdue_tasks_count": overdue_count,
+            "upcoming_tasks": upcoming_by_house[house.id]
+        })
+
+    return result
@@ -1,9 +1,16 @@
 from typing import Any, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from pydantic import BaseModel
+from sqlalchemy import delete, func, insert, select
 from sqlalchemy.orm import Session
 from .... import models
 from ....api import deps
+from ....core import changelog, jobs
+from ....core.cache import house_tag, response_cache
+from ....core.tracing import tracer
+from ....db import statements
+from ....db.shards import ShardSessions
+from .jobs import serialize_job
 
 router = APIRouter()
 
@@ -11,6 +18,38 @@ class CreateHouseRequest(BaseModel):
     name: str
     description: Optional[str] = None
 
+def user_houses_filter(db: Session, user_id: int):
+    """
+    Filter matching houses the user created or is a member of
+    """
+    return (models.House.creator_id == user_id) | (models.House.id.in_(
+        db.query(models.HouseMember.house_id).filter(
+            models.HouseMember.user_id == user_id
+        )
+    ))
+
+def member_counts_subquery(db: Session):
+    """
+    Per-house member counts, to be outer joined against houses
+    """
+    return db.query(
+        models.HouseMember.house_id.label("house_id"),
+        func.count(models.HouseMember.id).label("member_count")
+    ).group_by(models.HouseMember.house_id).subquery()
+
+def serialize_house(house: models.House, member_count: int, user_id: int) -> dict:
+    """
+    Convert a house row and its member count into the JSON shape returned by the house endpoints
+    """
+    return {
+        "id": house.id,
+        "name": house.name,
+        "description": house.description,
+        "members_count": member_count + 1,  # +1 for creator
+        "created_at": house.created_at.isoformat(),
+        "is_creator": house.creator_id == user_id
+    }
+
 @router.get("/user")
 async def get_user_houses(
     current_user: models.User = Depends(deps.get_current_user),
@@ -19,33 +58,35 @@ async def get_user_houses(
     """
     Get all houses for the current user
     """
-    # Get houses where user is creator or member
-    houses = db.query(models.House).filter(
-        (models.House.creator_id == current_user.id) |
-        (models.House.id.in_(
-            db.query(models.HouseMember.house_id).filter(
-                models.HouseMember.user_id == current_user.id
-            )
-        ))
-    ).all()
-
-    result = []
-    for house in houses:
-        # Count members
-        member_count = db.query(models.HouseMember).filter(
-            models.HouseMember.house_id == house.id
-        ).count() + 1  # +1 for creator
-
-        result.append({
-            "id": house.id,
-            "name": house.name,
-            "description": house.description,
-            "members_count": member_count,
-            "created_at": house.created_at.isoformat(),
-            "is_creator": house.creator_id == current_user.id
-        })
-
-    return result
+    house_ids = db.scalars(statements.user_house_ids(current_user.id)).all()
+    keys = {f"houses:house:{house_id}": house_id for house_id in house_ids}
+
+    async def compute(missing: List[str]):
+        # The missing houses with their member counts in one query
+        member_counts = member_counts_subquery(db)
+        houses = db.query(
+            models.House,
+            func.coalesce(member_counts.c.member_count, 0)
+        ).outerjoin(
+            member_counts, member_counts.c.house_id == models.House.id
+        ).filter(
+            models.House.id.in_([keys[key] for key in missing])
+        ).all()
+
+        with tracer.span("serialize.houses", count=len(houses)):
+            # Shared by all members, so is_creator is filled in per request
+            serialized = {
+                house.id: (house.creator_id, serialize_house(house, member_count, house.creator_id))
+                for house, member_count in houses
+            }
+        # None for houses deleted since their ids were read
+        return {key: (serialized.get(keys[key]), [house_tag(keys[key])]) for key in missing}
+
+    cached = await response_cache.get_or_compute_many(keys, compute)
+    return [
+        {**cached[key][1], "is_creator": cached[key][0] == current_user.id}
+        for key in keys if cached[key] is not None
+    ]
 
 @router.post("/create")
 async def create_house(
@@ -56,23 +97,26 @@ async def create_house(
     """
     Create a new house
     """
-    # Create house
-    db_house = models.House(
-        name=request.name,
-        description=request.description,
-        creator_id=current_user.id
+    # Create house and add creator as first member in one transaction
+    db_house = db.scalars(
+        insert(models.House).values(
+            name=request.name,
+            description=request.description,
+            creator_id=current_user.id
+        ).returning(models.House)
+    ).one()
+    db.execute(
+        insert(models.HouseMember).values(
+            house_id=db_house.id,
+            user_id=current_user.id
+        )
     )
-    db.add(db_house)
-    db.commit()
-    db.refresh(db_house)
-
-    # Add creator as first member
-    db_member = models.HouseMember(
-        house_id=db_house.id,
-        user_id=current_user.id
+    changelog.record_change(
+        db, changelog.HOUSE, db_house.id, changelog.UPSERT, house_id=db_house.id
     )
-    db.add(db_member)
     db.commit()
+    # A cached entry may be left under the id from a deleted house
+    response_cache.invalidate(house_ids=[db_house.id], user_ids=[current_user.id])
 
     return {
         "id": db_house.id,
@@ -111,19 +155,54 @@ async def exit_house(
         models.HouseMember.house_id == house_id,
         models.HouseMember.user_id == current_user.id
     ).delete()
+    changelog.record_change(
+        db, changelog.HOUSE, house_id, changelog.DELETE,
+        house_id=house_id, user_id=current_user.id
+    )
+    changelog.record_change(db, changelog.HOUSE, house_id, changelog.UPSERT, house_id=house_id)
     db.commit()
+    response_cache.invalidate(house_ids=[house_id], user_ids=[current_user.id])
 
     return {"message": "Successfully exited house"}
 
+# Rows deleted per statement when purging a house's tasks in the background
+PURGE_BATCH_SIZE = 1000
+
+@jobs.job_handler("houses.purge_tasks")
+def purge_house_tasks(shards: ShardSessions, payload: dict, job_id: int) -> dict:
+    """
+    Delete the tasks and archived tasks of a deleted house in batches
+    """
+    house_id = payload["house_id"]
+    task_db = shards.for_house(house_id)
+    deleted = 0
+    for model in (models.Task, models.ArchivedTask):
+        while True:
+            ids = task_db.scalars(
+                select(model.id).where(model.house_id == house_id).limit(PURGE_BATCH_SIZE)
+            ).all()
+            if not ids:
+                break
+            task_db.execute(delete(model).where(model.id.in_(ids)))
+            shards.commit()
+            deleted += len(ids)
+    return {"house_id": house_id, "deleted_tasks": deleted}
+
 @router.delete("/delete")
 async def delete_house(
     *,
     db: Session = Depends(deps.get_db),
     current_user: models.User = Depends(deps.get_current_user),
-    house_id: int
+    shards: ShardSessions = Depends(deps.get_shards),
+    response: Response,
+    house_id: int,
+    background: bool = False
 ) -> Any:
     """
-    Delete a house (only creator can delete)
+    Delete a house (only creator can delete).
+
+    With `background=true` the house is removed right away and its tasks are
+    deleted by a background job; returns `202` with the job to poll.
     """
     house = db.query(models.House).filter(models.House.id == house_id).first()
     if not house:
@@ -138,12 +217,33 @@ async def delete_house(
             detail="Only house creator can delete the house"
         )
 
+    # Leave a tombstone for every member, since none of them can see the house afterwards
+    member_ids = {current_user.id} | set(db.scalars(
+        select(models.HouseMember.user_id).where(models.HouseMember.house_id == house_id)
+    ))
+
     # Delete all tasks, members, and house
-    db.query(models.Task).filter(models.Task.house_id == house_id).delete()
     db.query(models.HouseMember).filter(models.HouseMember.house_id == house_id).delete()
     db.delete(house)
-    db.commit()
+    if background:
+        # Tasks of a deleted house are unreachable, so they can go later
+        job = jobs.enqueue(db, "houses.purge_tasks", {"house_id": house_id}, user_id=current_user.id)
+    else:
+        task_db = shards.for_house(house_id)
+        task_db.query(models.Task).filter(models.Task.house_id == house_id).delete()
+        task_db.query(models.ArchivedTask).filter(models.ArchivedTask.house_id == house_id).delete()
+    # Logged last, as appending holds the change log lock until commit
+    for member_id in member_ids:
+        changelog.record_change(
+            db, changelog.HOUSE, house_id, changelog.DELETE,
+            house_id=house_id, user_id=member_id
+        )
+    shards.commit()
+    response_cache.invalidate(house_ids=[house_id])
 
+    if background:
+        response.status_code = status.HTTP_202_ACCEPTED
+        return {"message": "House deleted, tasks are being removed", "job": serialize_job(job)}
     return {"message": "House deleted successfully"}
 
 @router.post("/invite")
@@ -202,6 +302,13 @@ async def invite_to_house(
         user_id=invited_user.id
     )
     db.add(db_member)
+    changelog.record_change(db, changelog.HOUSE, house_id, changelog.UPSERT, house_id=house_id)
+    # Tells the invitee's /sync to send the tasks logged before they joined
+    changelog.record_change(
+        db, changelog.HOUSE, house_id, changelog.UPSERT,
+        house_id=house_id, user_id=invited_user.id
+    )
     db.commit()
+    response_cache.invalidate(house_ids=[house_id], user_ids=[invited_user.id])
 
     return {"message": f"Successfully invited {invited_user.name} to {house.name}"}
@@ -0,0 +1,43 @@
+import json
+from typing import Any
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from .... import models
+from ....api import deps
+
+router = APIRouter()
+
+def serialize_job(job: models.Job) -> dict:
+    """
+    Convert a job row into the JSON shape returned for polling
+    """
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "attempts": job.attempts,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None
+    }
+
+@router.get("/{job_id}")
+async def get_job(
+    job_id: int,
+    current_user: models.User = Depends(deps.get_current_user),
+    db: Session = Depends(deps.get_db)
+) -> Any:
+    """
+    Get the status of a background job started by the current user
+    """
+    job = db.query(models.Job).filter(
+        models.Job.id == job_id,
+        models.Job.user_id == current_user.id
+    ).first()
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    return serialize_job(job)
@@ -0,0 +1,122 @@
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from .... import models
+from ....api import deps
+from ....core import changelog
+from ....db.shards import ShardSessions, shard_router
+from .houses import member_counts_subquery, serialize_house, user_houses_filter
+from .tasks import get_assignee_names, serialize_task
+
+router = APIRouter()
+
+@router.get("")
+async def sync_changes(
+    since: Optional[int] = Query(None, ge=0),
+    limit: int = Query(500, ge=1, le=1000),
+    current_user: models.User = Depends(deps.get_current_user),
+    db: Session = Depends(deps.get_db),
+    shards: ShardSessions = Depends(deps.get_shards)
+) -> Any:
+    """
+    Get task and house changes after the `since` cursor.
+
+    Returns `reset: true` when no cursor is given or it is older than the
+    compacted log; the client should then re-download its houses and tasks
+    and sync from the returned cursor. Keep calling while `has_more` is true.
+    """
+    log = models.ChangeLog
+    latest_cursor = db.query(func.max(log.id)).scalar() or 0
+    if since is None or since < changelog.get_horizon(db):
+        return {"cursor": latest_cursor, "reset": True, "has_more": False, "changes": []}
+
+    user_house_ids = db.query(models.House.id).filter(user_houses_filter(db, current_user.id))
+    entries = db.query(log).filter(
+        log.id > since,
+        log.entity != changelog.LOG,
+        (log.user_id == current_user.id) |
+        (log.user_id.is_(None) & log.house_id.in_(user_house_ids))
+    ).order_by(log.id).limit(limit + 1).all()
+
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    cursor = entries[-1].id if entries else max(since, latest_cursor)
+
+    # Only the latest change per entity matters
+    latest = {}
+    for entry in entries:
+        latest.pop((entry.entity, entry.entity_id), None)
+        latest[(entry.entity, entry.entity_id)] = entry
+
+    task_ids = [entity_id for (entity, entity_id), entry in latest.items()
+                if entity == changelog.TASK and entry.op == changelog.UPSERT]
+    house_ids = [entity_id for (entity, entity_id), entry in latest.items()
+                 if entity == changelog.HOUSE and entry.op == changelog.UPSERT]
+
+    # A user-scoped house upsert means the user joined the house; its tasks
+    # were logged before they could see them, so send all of them
+    joined_house_ids = {
+        entry.house_id for entry in entries
+        if entry.entity == changelog.HOUSE and entry.op == changelog.UPSERT
+        and entry.user_id == current_user.id
+    }
+    if joined_house_ids:
+        joined_house_ids &= {house_id for house_id, in user_house_ids}
+
+    def query_shard(task_db: Session, local_ids: List[int]) -> List[models.Task]:
+        return task_db.query(models.Task).filter(models.Task.id.in_(local_ids)).all()
+
+    def query_house_tasks(task_db: Session, shard_house_ids: List[int]) -> List[models.Task]:
+        return task_db.query(models.Task).filter(models.Task.house_id.in_(shard_house_ids)).all()
+
+    tasks = {
+        shard_router.public_task_id(task.id, task.house_id): task
+        for task in await shards.fan_out(shard_router.group_tasks(task_ids), query_shard)
+    }
+    joined_tasks = {
+        shard_router.public_task_id(task.id, task.house_id): task
+        for task in await shards.fan_out(shard_router.group_houses(joined_house_ids), query_house_tasks)
+    }
+    assignee_names = get_assignee_names(db, [*tasks.values(), *joined_tasks.values()])
+    houses = {}
+    if house_ids:
+        member_counts = member_counts_subquery(db)
+        houses = {
+            house.id: (house, member_count)
+            for house, member_count in db.query(
+                models.House,
+                func.coalesce(member_counts.c.member_count, 0)
+            ).outerjoin(
+                member_counts, member_counts.c.house_id == models.House.id
+            ).filter(models.House.id.in_(house_ids))
+        }
+
+    changes = []
+    for (entity, entity_id), entry in latest.items():
+        data = None
+        if entry.op == changelog.UPSERT:
+            if entity == changelog.TASK and entity_id in tasks:
+                data = serialize_task(tasks[entity_id], assignee_names)
+            elif entity == changelog.HOUSE and entity_id in houses:
+                data = serialize_house(*houses[entity_id], current_user.id)
+        changes.append({
+            "entity": entity,
+            "id": entity_id,
+            "house_id": entry.house_id,
+            # Rows gone since the upsert was logged are reported as deleted
+            "op": changelog.UPSERT if data is not None else changelog.DELETE,
+            "data": data
+        })
+
+    for task_id, task in joined_tasks.items():
+        if (changelog.TASK, task_id) not in latest:
+            changes.append({
+                "entity": changelog.TASK,
+                "id": task_id,
+                "house_id": task.house_id,
+                "op": changelog.UPSERT,
+                "data": serialize_task(task, assignee_names)
+            })
+
+    return {"cursor": cursor, "reset": False, "has_more": has_more, "changes": changes}
@@ -1,110 +1,497 @@
-from typing import Any, List, Optional
-from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from pydantic import BaseModel, Field
+from sqlalchemy import case, func, insert, select, update
 from sqlalchemy.orm import Session
 from .... import models
 from ....api import deps
+from ....core import changelog, jobs
+from ....core.cache import house_tag, response_cache
+from ....core.tracing import tracer
+from ....db import statements
+from ....db.shards import ShardSessions, shard_router
+from .jobs import serialize_job
 
 router = APIRouter()
 
+# Longest range /tasks/calendar serves, enough for a month view with padding weeks
+CALENDAR_MAX_DAYS = 62
+
+class ImportTask(BaseModel):
+    title: str
+    description: Optional[str] = None
+    assigned_to: Optional[str] = None  # Name or email of a house member
+    deadline: Optional[datetime] = None
+    priority: str = "medium"
+    completed: bool = False
+
+class ImportTasksRequest(BaseModel):
+    house_id: int
+    tasks: List[ImportTask] = Field(max_length=10000)
+
+def get_assignee_names(db: Session, tasks: Iterable[models.Task]) -> Dict[int, str]:
+    """
+    Look up the display names of the tasks' assignees in one directory query
+    """
+    assignee_ids = {task.assignee_id for task in tasks if task.assignee_id is not None}
+    if not assignee_ids:
+        return {}
+    return dict(
+        db.query(models.User.id, models.User.name).filter(models.User.id.in_(assignee_ids))
+    )
+
+def serialize_task(task: models.Task, assignee_names: Dict[int, str]) -> dict:
+    """
+    Convert a task row into the JSON shape returned by the task endpoints,
+    with assignee names from `get_assignee_names`
+    """
+    return {
+        "id": shard_router.public_task_id(task.id, task.house_id),
+        "title": task.title,
+        "description": task.description,
+        "assigned_to": assignee_names.get(task.assignee_id),
+        "assignee_id": task.assignee_id,
+        "deadline": task.deadline.isoformat() if task.deadline else None,
+        # NULL in rows old instances inserted until the migration converts them
+        "priority": models.TaskPriority(task.priority_level or models.TaskPriority.MEDIUM).label,
+        "completed": task.completed,
+        "completed_at": task.completed_at.isoformat() if task.completed_at else None,
+        "created_at": task.created_at.isoformat()
+    }
+
+def get_member_house(db: Session, house_id: int, user: models.User) -> models.House:
+    """
+    Get a house from the directory, checking the user is a member of it
+    """
+    row = db.execute(statements.house_with_membership(house_id, user.id)).first()
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="House not found"
+        )
+
+    house, is_member = row
+    if not is_member and house.creator_id != user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You are not a member of this house"
+        )
+    return house
+
+def parse_priority(priority: str) -> models.TaskPriority:
+    try:
+        return models.TaskPriority.from_label(priority)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid priority, use low, medium or high"
+        )
+
+def resolve_assignee(
+    db: Session, house_id: int, assigned_to: Optional[str] = None, assignee_id: Optional[int] = None
+) -> Optional[int]:
+    """
+    Resolve an assignee given by user id, or by email or name, to a member of
+    the house. Returns None (unassigned) when neither is given.
+    """
+    if assignee_id is not None:
+        match = models.User.id == assignee_id
+    elif assigned_to:
+        # Case-insensitive, as the migration matches legacy assignee strings
+        match = (func.lower(models.User.email) == assigned_to.strip().lower()) | \
+            (func.lower(func.trim(models.User.name)) == assigned_to.strip().lower())
+    else:
+        return None
+
+    user_id = db.scalar(
+        select(models.User.id).where(
+            match,
+            models.User.id.in_(
+                select(models.HouseMember.user_id).where(models.HouseMember.house_id == house_id)
+            ) | (models.User.id == select(models.House.creator_id).where(
+                models.House.id == house_id
+            ).scalar_subquery())
+        ).order_by(models.User.id).limit(1)
+    )
+    if user_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Assignee must be a member of the house"
+        )
+    return user_id
+
+def get_member_task(
+    shards: ShardSessions, task_id: int, user: models.User
+) -> Tuple[Session, models.Task]:
+    """
+    Get a task by its public id from its shard, checking the user is a member
+    of its house. Returns the shard session together with the task.
+    """
+    shard, local_id = shard_router.split_task_id(task_id)
+    task = None
+    if shard < shard_router.count:
+        task_db = shards.for_shard(shard)
+        task = task_db.query(models.Task).filter(models.Task.id == local_id).first()
+    if not task or shard_router.shard_for_house(task.house_id) != shard:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Task not found"
+        )
+
+    get_member_house(shards.db, task.house_id, user)
+    return task_db, task
+
+def _update_task_returning(db: Session, task: models.Task, values: dict) -> models.Task:
+    """
+    Apply an UPDATE ... RETURNING so the written row comes back without a refresh
+    """
+    # Expired attributes are filled from the RETURNING row instead of a new SELECT
+    task_id = task.id
+    db.expire(task)
+    return db.scalars(
+        update(models.Task).where(
+            models.Task.id == task_id
+        ).values(**values).returning(models.Task),
+        execution_options={"synchronize_session": False}
+    ).one()
+
+def _record_task_change(db: Session, task: models.Task, op: str) -> None:
+    changelog.record_change(
+        db, changelog.TASK, shard_router.public_task_id(task.id, task.house_id), op,
+        house_id=task.house_id
+    )
+
 @router.get("/today")
 async def get_today_tasks(
     house_id: Optional[int] = None,
+    assigned_to_me: bool = False,
+    priority: Optional[str] = None,
     current_user: models.User = Depends(deps.get_current_user),
-    db: Session = Depends(deps.get_db)
+    db: Session = Depends(deps.get_db),
+    shards: ShardSessions = Depends(deps.get_shards)
 ) -> Any:
     """
-    Get today's tasks for user or specific house
+    Get today's tasks for user or specific house, optionally only those
+    assigned to the user or of one priority
     """
-    query = db.query(models.Task)
-
+    priority_level = parse_priority(priority) if priority else None
     if house_id:
-        # Check if user is member of the house
-        house = db.query(models.House).filter(models.House.id == house_id).first()
-        if not house:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="House not found"
-            )
+        get_member_house(db, house_id, current_user)
+        house_ids = [house_id]
+    else:
+        house_ids = db.scalars(statements.user_house_ids(current_user.id)).all()
+
+    tasks_by_house = await get_house_tasks(db, shards, house_ids)
+    tasks = [task for task_house_id in house_ids for task in tasks_by_house[task_house_id]]
+    if assigned_to_me:
+        tasks = [task for task in tasks if task["assignee_id"] == current_user.id]
+    if priority_level is not None:
+        label = models.TaskPriority(priority_level).label
+        tasks = [task for task in tasks if task["priority"] == label]
+    return tasks
+
+async def get_house_tasks(db: Session, shards: ShardSessions, house_ids: List[int]) -> Dict[int, List[dict]]:
+    """
+    Serialized tasks of each house, cached per house so that all of its
+    members share one computation; callers check membership first
+    """
+    keys = {f"tasks:house:{house_id}": house_id for house_id in house_ids}
 
-        is_member = db.query(models.HouseMember).filter(
-            models.HouseMember.house_id == house_id,
-            models.HouseMember.user_id == current_user.id
-        ).first()
+    async def compute(missing: List[str]):
+        missing_house_ids = [keys[key] for key in missing]
 
-        if not is_member and house.creator_id != current_user.id:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You are not a member of this house"
-            )
+        def query_shard(task_db: Session, shard_house_ids: List[int]) -> List[models.Task]:
+            return task_db.query(models.Task).filter(models.Task.house_id.in_(shard_house_ids)).all()
+
+        # Query the shards concurrently
+        tasks = await shards.fan_out(shard_router.group_houses(missing_house_ids), query_shard)
+
+        with tracer.span("serialize.tasks", count=len(tasks)):
+            assignee_names = get_assignee_names(db, tasks)
+            serialized = {house_id: [] for house_id in missing_house_ids}
+            for task in tasks:
+                serialized[task.house_id].append(serialize_task(task, assignee_names))
+        return {
+            f"tasks:house:{house_id}": (house_tasks, [house_tag(house_id)])
+            for house_id, house_tasks in serialized.items()
+        }
+
+    cached = await response_cache.get_or_compute_many(keys, compute)
+    return {house_id: cached[key] for key, house_id in keys.items()}
+
+def _local_day(column, dialect: str, zone: ZoneInfo, start: datetime, end: datetime):
+    """
+    SQL expression for the calendar day of a UTC timestamp `column` in `zone`,
+    valid for timestamps between `start` and `end`
+    """
+    if dialect == "postgresql":
+        return func.date(func.timezone(zone.key, column))
+
+    # SQLite has no time zones: shift by the UTC offset, which is constant
+    # between the zone's transitions inside the range (found on a 15 minute grid)
+    segments = []  # (segment start, offset in seconds)
+    moment = start
+    while moment < end:
+        offset = int(moment.astimezone(zone).utcoffset().total_seconds())
+        if not segments or segments[-1][1] != offset:
+            segments.append((moment, offset))
+        moment += timedelta(minutes=15)
+
+    def shifted(offset: int):
+        return func.date(column, f"{offset:+d} seconds")
+
+    if len(segments) == 1:
+        return shifted(segments[0][1])
+    return case(
+        *[
+            (column < next_start, shifted(offset))
+            for (_, offset), (next_start, _) in zip(segments, segments[1:])
+        ],
+        else_=shifted(segments[-1][1])
+    )
 
-        query = query.filter(models.Task.house_id == house_id)
+@router.get("/calendar")
+async def get_task_calendar(
+    from_date: date = Query(..., alias="from"),
+    to_date: date = Query(..., alias="to"),
+    tz: str = "UTC",
+    house_id: Optional[int] = None,
+    include_ids: bool = False,
+    current_user: models.User = Depends(deps.get_current_user),
+    db: Session = Depends(deps.get_db),
+    shards: ShardSessions = Depends(deps.get_shards)
+) -> Any:
+    """
+    Get open, completed and overdue task counts per day between `from` and
+    `to` (inclusive), bucketing deadlines by calendar day in time zone `tz`.
+    With `include_ids=true` each day also lists its task ids.
+    """
+    if to_date < from_date or (to_date - from_date).days >= CALENDAR_MAX_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Range must be 1 to {CALENDAR_MAX_DAYS} days"
+        )
+    try:
+        zone = ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unknown time zone"
+        )
+
+    if house_id:
+        get_member_house(db, house_id, current_user)
+        house_ids = [house_id]
     else:
-        # Get tasks from all user's houses
-        user_house_ids = db.query(models.HouseMember.house_id).filter(
-            models.HouseMember.user_id == current_user.id
-        ).subquery()
-
-        query = query.filter(
-            models.Task.house_id.in_(
-                db.query(models.House.id).filter(
-                    (models.House.creator_id == current_user.id) |
-                    (models.House.id.in_(user_house_ids))
-                )
-            )
+        house_ids = db.scalars(statements.user_house_ids(current_user.id)).all()
+
+    # Local midnights of the first and the day after the last day, in UTC
+    start = datetime.combine(from_date, time(), zone).astimezone(timezone.utc)
+    end = datetime.combine(to_date + timedelta(days=1), time(), zone).astimezone(timezone.utc)
+    # Aware, so Postgres compares it as UTC whatever the session's TimeZone
+    now = datetime.now(timezone.utc)
+    is_open = models.Task.completed.is_(False)
+
+    def query_shard(task_db: Session, shard_house_ids: List[int]) -> list:
+        day = _local_day(models.Task.deadline, task_db.bind.dialect.name, zone, start, end)
+        # Served by the (house_id, deadline) index
+        in_range = (
+            models.Task.house_id.in_(shard_house_ids),
+            models.Task.deadline >= start,
+            models.Task.deadline < end
         )
+        counts = task_db.query(
+            day,
+            func.sum(case((is_open, 1), else_=0)),
+            func.sum(case((models.Task.completed.is_(True), 1), else_=0)),
+            func.sum(case((is_open & (models.Task.deadline < now), 1), else_=0))
+        ).filter(*in_range).group_by(day).all()
+
+        ids = []
+        if include_ids:
+            ids = task_db.query(day, models.Task.id, models.Task.house_id).filter(
+                *in_range
+            ).order_by(models.Task.deadline, models.Task.id).all()
+        return [(counts, ids)]
+
+    days = {
+        (from_date + timedelta(days=offset)).isoformat(): {
+            "open": 0, "completed": 0, "overdue": 0, **({"task_ids": []} if include_ids else {})
+        }
+        for offset in range((to_date - from_date).days + 1)
+    }
+    for counts, ids in await shards.fan_out(shard_router.group_houses(house_ids), query_shard):
+        for bucket, open_count, completed_count, overdue_count in counts:
+            # Postgres returns dates, SQLite strings
+            totals = days[str(bucket)]
+            totals["open"] += open_count or 0
+            totals["completed"] += completed_count or 0
+            totals["overdue"] += overdue_count or 0
+        for bucket, task_id, task_house_id in ids:
+            days[str(bucket)]["task_ids"].append(shard_router.public_task_id(task_id, task_house_id))
 
-    tasks = query.all()
+    return {
+        "from": from_date.isoformat(),
+        "to": to_date.isoformat(),
+        "tz": zone.key,
+        "days": [{"date": day, **totals} for day, totals in days.items()]
+    }
 
-    result = []
-    for task in tasks:
-        result.append({
-            "id": task.id,
-            "title": task.title,
-            "description": task.description,
-            "assigned_to": task.assigned_to,
-            "deadline": task.deadline.isoformat() if task.deadline else None,
-            "priority": task.priority,
-            "completed": task.completed,
-            "completed_at": task.completed_at.isoformat() if task.completed_at else None,
-            "created_at": task.created_at.isoformat()
-        })
+@router.get("/history")
+async def get_task_history(
+    house_id: int,
+    limit: int = Query(50, ge=1, le=500),
+    before_id: Optional[int] = None,
+    current_user: models.User = Depends(deps.get_current_user),
+    db: Session = Depends(deps.get_db),
+    shards: ShardSessions = Depends(deps.get_shards)
+) -> Any:
+    """
+    Get archived tasks for a house, newest first (page with before_id)
+    """
+    get_member_house(db, house_id, current_user)
+
+    task_db = shards.for_house(house_id)
+    query = task_db.query(models.ArchivedTask).filter(models.ArchivedTask.house_id == house_id)
+    if before_id is not None:
+        _, local_before_id = shard_router.split_task_id(before_id)
+        query = query.filter(models.ArchivedTask.id < local_before_id)
+    tasks = query.order_by(models.ArchivedTask.id.desc()).limit(limit).all()
+
+    assignee_names = get_assignee_names(db, tasks)
+    return [
+        {
+            **serialize_task(task, assignee_names),
+            "archived_at": task.archived_at.isoformat() if task.archived_at else None
+        }
+        for task in tasks
+    ]
+
+@jobs.job_handler("tasks.export")
+def export_house_tasks(shards: ShardSessions, payload: dict, job_id: int) -> dict:
+    """
+    Collect all tasks of a house, including archived ones
+    """
+    house_id = payload["house_id"]
+    task_db = shards.for_house(house_id)
+    tasks = task_db.query(models.Task).filter(
+        models.Task.house_id == house_id
+    ).order_by(models.Task.id).all()
+    archived = task_db.query(models.ArchivedTask).filter(
+        models.ArchivedTask.house_id == house_id
+    ).order_by(models.ArchivedTask.id).all()
+    assignee_names = get_assignee_names(shards.db, tasks + archived)
+    return {
+        "house_id": house_id,
+        "tasks": [serialize_task(task, assignee_names) for task in tasks],
+        "archived_tasks": [serialize_task(task, assignee_names) for task in archived]
+    }
 
-    return result
+@jobs.job_handler("tasks.import")
+def import_house_tasks(shards: ShardSessions, payload: dict, job_id: int) -> dict:
+    """
+    Insert a batch of tasks into a house in one transaction
+    """
+    house_id = payload["house_id"]
+    task_db = shards.for_house(house_id)
+    if not jobs.mark_applied(task_db, job_id):
+        # An earlier attempt committed the import but didn't record the outcome
+        return {"house_id": house_id, "imported": 0, "already_imported": True}
+    rows = [
+        {
+            **task,
+            "house_id": house_id,
+            "deadline": datetime.fromisoformat(task["deadline"].replace("Z", "+00:00")) if task["deadline"] else None,
+            "completed_at": datetime.utcnow() if task["completed"] else None
+        }
+        for task in payload["tasks"]
+    ]
+    task_ids = task_db.scalars(insert(models.Task).returning(models.Task.id), rows).all()
+    changelog.lock_change_log(shards.db)
+    shards.db.execute(insert(models.ChangeLog), [
+        {
+            "entity": changelog.TASK,
+            "entity_id": shard_router.public_task_id(task_id, house_id),
+            "op": changelog.UPSERT,
+            "house_id": house_id
+        }
+        for task_id in task_ids
+    ])
+    shards.commit()
+    response_cache.invalidate(house_ids=[house_id])
+    return {"house_id": house_id, "imported": len(task_ids)}
+
+@router.post("/export", status_code=status.HTTP_202_ACCEPTED)
+async def export_tasks(
+    *,
+    db: Session = Depends(deps.get_db),
+    current_user: models.User = Depends(deps.get_current_user),
+    house_id: int
+) -> Any:
+    """
+    Start exporting all tasks of a house; poll the returned job for the result
+    """
+    get_member_house(db, house_id, current_user)
+
+    job = jobs.enqueue(db, "tasks.export", {"house_id": house_id}, user_id=current_user.id)
+    db.commit()
+    return serialize_job(job)
+
+@router.post("/import", status_code=status.HTTP_202_ACCEPTED)
+async def import_tasks(
+    *,
+    db: Session = Depends(deps.get_db),
+    current_user: models.User = Depends(deps.get_current_user),
+    request: ImportTasksRequest
+) -> Any:
+    """
+    Start importing tasks into a house; poll the returned job for the outcome
+    """
+    get_member_house(db, request.house_id, current_user)
+
+    # Validate up front, resolving each distinct assignee once
+    assignee_ids = {
+        assigned_to: resolve_assignee(db, request.house_id, assigned_to)
+        for assigned_to in {task.assigned_to for task in request.tasks}
+    }
+    tasks = [
+        {
+            **task.model_dump(mode="json", exclude={"assigned_to", "priority"}),
+            "assignee_id": assignee_ids[task.assigned_to],
+            "priority_level": int(parse_priority(task.priority))
+        }
+        for task in request.tasks
+    ]
+
+    job = jobs.enqueue(
+        db, "tasks.import", {"house_id": request.house_id, "tasks": tasks}, user_id=current_user.id
+    )
+    db.commit()
+    return serialize_job(job)
 
 @router.post("/create")
 async def create_task(
     *,
     db: Session = Depends(deps.get_db),
     current_user: models.User = Depends(deps.get_current_user),
+    shards: ShardSessions = Depends(deps.get_shards),
     title: str,
     house_id: int,
     description: str = None,
     assigned_to: str = None,
+    assignee_id: int = None,
     deadline: str = None,
     priority: str = "medium"
 ) -> Any:
     """
-    Create a new task
+    Create a new task, assigned by user id or by a member's name or email
     """
     # Check if house exists and user is member
-    house = db.query(models.House).filter(models.House.id == house_id).first()
-    if not house:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="House not found"
-        )
-
-    is_member = db.query(models.HouseMember).filter(
-        models.HouseMember.house_id == house_id,
-        models.HouseMember.user_id == current_user.id
-    ).first()
-
-    if not is_member and house.creator_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You are not a member of this house"
-        )
+    get_member_house(db, house_id, current_user)
+    priority_level = parse_priority(priority)
+    assignee_id = resolve_assignee(db, house_id, assigned_to, assignee_id)
 
     # Parse deadline if provided
     deadline_dt = None
@@ -117,84 +504,62 @@ async def create_task(
                 detail="Invalid deadline format"
             )
 
-    # Create task
-    db_task = models.Task(
-        title=title,
-        description=description,
-        house_id=house_id,
-        assigned_to=assigned_to,
-        deadline=deadline_dt,
-        priority=priority
-    )
-    db.add(db_task)
-    db.commit()
-    db.refresh(db_task)
-
-    return {
-        "id": db_task.id,
-        "title": db_task.title,
-        "description": db_task.description,
-        "assigned_to": db_task.assigned_to,
-        "deadline": db_task.deadline.isoformat() if db_task.deadline else None,
-        "priority": db_task.priority,
-        "completed": db_task.completed,
-        "completed_at": db_task.completed_at.isoformat() if db_task.completed_at else None,
-        "created_at": db_task.created_at.isoformat()
-    }
+    # Create task on the house's shard
+    task_db = shards.for_house(house_id)
+    db_task = task_db.scalars(
+        insert(models.Task).values(
+            title=title,
+            description=description,
+            house_id=house_id,
+            assignee_id=assignee_id,
+            deadline=deadline_dt,
+            priority_level=priority_level
+        ).returning(models.Task)
+    ).one()
+    _record_task_change(db, db_task, changelog.UPSERT)
+    shards.commit()
+    response_cache.invalidate(house_ids=[house_id])
+
+    return serialize_task(db_task, get_assignee_names(db, [db_task]))
 
 @router.put("/update")
 async def update_task(
     *,
     db: Session = Depends(deps.get_db),
     current_user: models.User = Depends(deps.get_current_user),
+    shards: ShardSessions = Depends(deps.get_shards),
     task_id: int,
     title: str = None,
     description: str = None,
     assigned_to: str = None,
+    assignee_id: int = None,
     deadline: str = None,
     priority: str = None,
     completed: bool = None
 ) -> Any:
     """
-    Update an existing task
+    Update an existing task; an empty `assigned_to` unassigns it
     """
-    task = db.query(models.Task).filter(models.Task.id == task_id).first()
-    if not task:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Task not found"
-        )
+    task_db, task = get_member_task(shards, task_id, current_user)
 
-    # Check if user is member of the house
-    house = db.query(models.House).filter(models.House.id == task.house_id).first()
-    is_member = db.query(models.HouseMember).filter(
-        models.HouseMember.house_id == task.house_id,
-        models.HouseMember.user_id == current_user.id
-    ).first()
-
-    if not is_member and house.creator_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You are not a member of this house"
-        )
-
-    # Update fields
+    # Collect changed fields
+    values = {}
     if title is not None:
-        task.title = title
+        values["title"] = title
     if description is not None:
-        task.description = description
-    if assigned_to is not None:
-        task.assigned_to = assigned_to
+        values["description"] = description
+    if assigned_to is not None or assignee_id is not None:
+        values["assignee_id"] = resolve_assignee(db, task.house_id, assigned_to, assignee_id)
     if priority is not None:
-        task.priority = priority
+        values["priority_level"] = parse_priority(priority)
 
     # Handle deadline
     if deadline is not None:
         if deadline == "":
-            task.deadline = None
+            values["deadline"] = None
         else:
             try:
-                task.deadline = datetime.fromisoformat(deadline.replace('Z', '+00:00'))
+                values["deadline"] = datetime.fromisoformat(deadline.replace('Z', '+00:00'))
             except ValueError:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
@@ -203,59 +568,34 @@ async def update_task(
 
     # Handle completion
     if completed is not None:
-        task.completed = completed
-        if completed:
-            task.completed_at = datetime.utcnow()
-        else:
-            task.completed_at = None
+        values["completed"] = completed
+        values["completed_at"] = datetime.utcnow() if completed else None
 
-    db.commit()
-    db.refresh(task)
+    if values:
+        task = _update_task_returning(task_db, task, values)
+        _record_task_change(db, task, changelog.UPSERT)
+        shards.commit()
+        response_cache.invalidate(house_ids=[task.house_id])
 
-    return {
-        "id": task.id,
-        "title": task.title,
-        "description": task.description,
-        "assigned_to": task.assigned_to,
-        "deadline": task.deadline.isoformat() if task.deadline else None,
-        "priority": task.priority,
-        "completed": task.completed,
-        "completed_at": task.completed_at.isoformat() if task.completed_at else None,
-        "created_at": task.created_at.isoformat()
-    }
+    return serialize_task(task, get_assignee_names(db, [task]))
 
 @router.delete("/delete")
 async def delete_task(
     *,
     db: Session = Depends(deps.get_db),
     current_user: models.User = Depends(deps.get_current_user),
+    shards: ShardSessions = Depends(deps.get_shards),
     task_id: int
 ) -> Any:
     """
     Delete a task
     """
-    task = db.query(models.Task).filter(models.Task.id == task_id).first()
-    if not task:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Task not found"
-        )
+    task_db, task = get_member_task(shards, task_id, current_user)
 
-    # Check if user is member of the house
-    house = db.query(models.House).filter(models.House.id == task.house_id).first()
-    is_member = db.query(models.HouseMember).filter(
-        models.HouseMember.house_id == task.house_id,
-        models.HouseMember.user_id == current_user.id
-    ).first()
-
-    if not is_member and house.creator_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You are not a member of this house"
-        )
-
-    db.delete(task)
-    db.commit()
+    task_db.delete(task)
+    _record_task_change(db, task, changelog.DELETE)
+    shards.commit()
+    response_cache.invalidate(house_ids=[task.house_id])
 
     return {"message": "Task deleted successfully"}
 
@@ -264,44 +604,19 @@ async def complete_task(
     *,
     db: Session = Depends(deps.get_db),
     current_user: models.User = Depends(deps.get_current_user),
+    shards: ShardSessions = Depends(deps.get_shards),
     task_id: int
 ) -> Any:
     """
     Mark a task as completed
     """
-    task = db.query(models.Task).filter(models.Task.id == task_id).first()
-    if not task:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Task not found"
-        )
-
-    # Check if user is member of the house
-    house = db.query(models.House).filter(models.House.id == task.house_id).first()
-    is_member = db.query(models.HouseMember).filter(
-        models.HouseMember.house_id == task.house_id,
-        models.HouseMember.user_id == current_user.id
-    ).first()
-
-    if not is_member and house.creator_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You are not a member of this house"
-        )
+    task_db, task = get_member_task(shards, task_id, current_user)
 
-    task.completed = True
-    task.completed_at = datetime.utcnow()
-    db.commit()
-    db.refresh(task)
+    task = _update_task_returning(
+        task_db, task, {"completed": True, "completed_at": datetime.utcnow()}
+    )
+    _record_task_change(db, task, changelog.UPSERT)
+    shards.commit()
+    response_cache.invalidate(house_ids=[task.house_id])
 
-    return {
-        "id": task.id,
-        "title": task.title,
-        "description": task.description,
-        "assigned_to": task.assigned_to,
-        "deadline": task.deadline.isoformat() if task.deadline else None,
-        "priority": task.priority,
-        "completed": task.completed,
-        "completed_at": task.completed_at.isoformat() if task.completed_at else None,
-        "created_at": task.created_at.isoformat()
-    }
+    return serialize_task(task, get_assignee_names(db, [task]))
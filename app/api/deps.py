@@ -1,22 +1,42 @@
-from typing import Generator
-from fastapi import Depends, HTTPException, status
+from typing import Generator, Optional
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt
 from pydantic import ValidationError
 from sqlalchemy.orm import Session
 from .. import models
-from ..core.config import settings
+from ..core import auth
+from ..core.tracing import tracer
+from ..db import statements
 from ..db.session import SessionLocal
+from ..db.shards import ShardSessions
 
-reusable_oauth2 = HTTPBearer()
+class TracedHTTPBearer(HTTPBearer):
+    async def __call__(self, request: Request) -> Optional[HTTPAuthorizationCredentials]:
+        with tracer.span("dependency.http_bearer"):
+            return await super().__call__(request)
+
+reusable_oauth2 = TracedHTTPBearer()
 
 def get_db() -> Generator:
     try:
-        db = SessionLocal()
+        with tracer.span("dependency.get_db"):
+            db = SessionLocal()
         yield db
     finally:
         db.close()
 
+def get_shards(db: Session = Depends(get_db)) -> Generator:
+    """
+    Sessions for the shards holding house-scoped data, sharing the request's
+    directory session
+    """
+    shards = ShardSessions(db)
+    try:
+        yield shards
+    finally:
+        shards.close()
+
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(reusable_oauth2),
     db: Session = Depends(get_db)
@@ -24,22 +44,21 @@ def get_current_user(
     """
     Validate JWT token and return current user
     """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(
-            credentials.credentials, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+    with tracer.span("dependency.get_current_user"):
+        credentials_exception = HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
         )
-        user_id: str = payload.get("sub")
-        if user_id is None:
+        try:
+            payload = auth.decode_access_token(credentials.credentials)
+            user_id: str = payload.get("sub")
+            if user_id is None:
+                raise credentials_exception
+        except (jwt.JWTError, ValidationError):
             raise credentials_exception
-    except (jwt.JWTError, ValidationError):
-        raise credentials_exception
 
-    user = db.query(models.User).filter(models.User.id == int(user_id)).first()
-    if user is None:
-        raise credentials_exception
-    return user
+        user = db.scalars(statements.user_by_id(int(user_id))).first()
+        if user is None:
+            raise credentials_exception
+        return user
@@ -0,0 +1,134 @@
+"""
+Background archiver moving old completed tasks from `tasks` into `tasks_archive`
+
+Runs every `TASK_ARCHIVE_INTERVAL_SECONDS` on the job workers (one of them
+per interval); run it once from the command line with
+`python -m app.core.archiver`.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError
+from .. import models
+from ..core import changelog, jobs
+from ..core.cache import response_cache
+from ..core.config import settings
+from ..db.session import SessionLocal
+from ..db.shards import ShardSessions, shard_router
+
+logger = logging.getLogger(__name__)
+
+ARCHIVED_COLUMNS = [
+    "id", "title", "description", "house_id", "assignee_id", "deadline",
+    "priority_level", "completed", "completed_at", "created_at", "updated_at"
+]
+
+
+def archive_batch(
+    shards: ShardSessions, shard: int, cutoff: datetime, batch_size: int, after_id: int = 0
+) -> Tuple[int, Optional[int]]:
+    """
+    Move up to `batch_size` tasks of one shard completed before `cutoff`,
+    looking at ids after `after_id`. Returns the number of tasks moved and
+    the last id looked at, which is None once there are no more tasks.
+    """
+    task_db = shards.for_shard(shard)
+    rows = task_db.execute(
+        select(models.Task.id, models.Task.house_id).where(
+            models.Task.id > after_id,
+            models.Task.completed.is_(True),
+            models.Task.completed_at < cutoff
+        ).order_by(models.Task.id).limit(batch_size)
+    ).all()
+    if not rows:
+        return 0, None
+    last_id = rows[-1][0]
+
+    # Ids already in the archive belong to another task (e.g. an id SQLite
+    # reused before tasks had AUTOINCREMENT); leave those tasks in place
+    conflicts = set(task_db.scalars(
+        select(models.ArchivedTask.id).where(models.ArchivedTask.id.in_([task_id for task_id, _ in rows]))
+    ))
+    if conflicts:
+        logger.warning(
+            "Not archiving tasks %s on shard %d: their ids are already in tasks_archive",
+            sorted(conflicts), shard
+        )
+        rows = [(task_id, house_id) for task_id, house_id in rows if task_id not in conflicts]
+        if not rows:
+            return 0, last_id
+    task_ids = [task_id for task_id, _ in rows]
+
+    try:
+        task_db.execute(
+            insert(models.ArchivedTask).from_select(
+                ARCHIVED_COLUMNS,
+                select(*[getattr(models.Task, column) for column in ARCHIVED_COLUMNS]).where(
+                    models.Task.id.in_(task_ids)
+                )
+            )
+        )
+        task_db.execute(delete(models.Task).where(models.Task.id.in_(task_ids)))
+        # Archived tasks drop out of the listings, so synced clients see them as deleted
+        changelog.lock_change_log(shards.db)
+        shards.db.execute(insert(models.ChangeLog), [
+            {
+                "entity": changelog.TASK,
+                "entity_id": shard_router.public_task_id(task_id, house_id),
+                "op": changelog.DELETE,
+                "house_id": house_id
+            }
+            for task_id, house_id in rows
+        ])
+        shards.commit()
+        response_cache.invalidate(house_ids={house_id for _, house_id in rows})
+    except IntegrityError:
+        # Another archiver inserted some of these ids since the check above;
+        # skip the batch, a later run picks up whatever it left
+        task_db.rollback()
+        shards.db.rollback()
+        logger.warning(
+            "Skipped archiving tasks %d-%d on shard %d after a conflict", task_ids[0], last_id, shard
+        )
+        return 0, last_id
+
+    return len(task_ids), last_id
+
+
+def archive_completed_tasks(
+    older_than: Optional[timedelta] = None, batch_size: Optional[int] = None
+) -> int:
+    """
+    Archive all tasks completed longer than `older_than` ago, shard by shard
+    and batch by batch
+    """
+    older_than = older_than or timedelta(days=settings.TASK_ARCHIVE_AFTER_DAYS)
+    batch_size = batch_size or settings.TASK_ARCHIVE_BATCH_SIZE
+    cutoff = datetime.utcnow() - older_than
+
+    total = 0
+    db = SessionLocal()
+    shards = ShardSessions(db)
+    try:
+        for shard in range(shard_router.count):
+            last_id = 0
+            while last_id is not None:
+                moved, last_id = archive_batch(shards, shard, cutoff, batch_size, last_id)
+                total += moved
+    finally:
+        shards.close()
+        db.close()
+
+    if total:
+        logger.info("Archived %d completed tasks", total)
+    return total
+
+
+if settings.TASK_ARCHIVE_ENABLED:
+    jobs.periodic_task("tasks.archive", settings.TASK_ARCHIVE_INTERVAL_SECONDS)(archive_completed_tasks)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(f"Archived {archive_completed_tasks()} tasks")
@@ -1,10 +1,40 @@
 from datetime import datetime, timedelta
-from typing import Any, Union
+from typing import Any, Optional, Tuple, Union
 from jose import jwt
 from passlib.context import CryptContext
 from ..core.config import settings
+from ..core.tracing import tracer
 
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+# Schemes that stored hashes may use, so switching schemes never locks users out
+HASH_SCHEMES = ["pbkdf2_sha256", "bcrypt", "argon2"]
+
+# Passwords used to be truncated to this many characters before hashing
+LEGACY_TRUNCATE_LENGTH = 50
+
+def create_pwd_context(scheme: str = None, rounds: int = None) -> CryptContext:
+    """
+    Hash with `scheme` at `rounds`; other schemes and costs still verify but
+    are reported as needing an update
+    """
+    scheme = scheme or settings.PASSWORD_HASH_SCHEME
+    rounds = settings.PASSWORD_HASH_ROUNDS if rounds is None else rounds
+    options = {}
+    if rounds:
+        options = {
+            f"{scheme}__default_rounds": rounds,
+            f"{scheme}__min_rounds": rounds,
+            f"{scheme}__max_rounds": rounds
+        }
+    context = CryptContext(
+        schemes=list(dict.fromkeys([scheme, *HASH_SCHEMES])), deprecated="auto", **options
+    )
+    # Fail at startup rather than on the first login if e.g. argon2-cffi is missing
+    handler = context.handler(scheme)
+    if hasattr(handler, "get_backend"):
+        handler.get_backend()
+    return context
+
+pwd_context = create_pwd_context()
 
 def create_access_token(
     subject: Union[str, Any], expires_delta: timedelta = None
@@ -16,14 +46,42 @@ def create_access_token(
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
     to_encode = {"exp": expire, "sub": str(subject)}
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    with tracer.span("auth.jwt_encode"):
+        encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
+def decode_access_token(token: str) -> dict:
+    """
+    Verify a token's signature and expiry and return its claims; raises
+    jose.JWTError for invalid tokens
+    """
+    with tracer.span("auth.jwt_decode"):
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    with tracer.span("auth.password_verify"):
+        return pwd_context.verify(plain_password, hashed_password)
+
+def verify_and_update(
+    plain_password: str, hashed_password: str, truncated: bool = False
+) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password; when it matches a hash with an outdated scheme or cost,
+    also return a new hash to store in its place (else None).
+
+    `truncated` marks a legacy hash that may be of the password cut to
+    LEGACY_TRUNCATE_LENGTH characters; it is always replaced on success.
+    """
+    with tracer.span("auth.password_verify"):
+        valid, new_hash = pwd_context.verify_and_update(plain_password, hashed_password)
+        if not valid and truncated and len(plain_password) > LEGACY_TRUNCATE_LENGTH:
+            valid = pwd_context.verify(plain_password[:LEGACY_TRUNCATE_LENGTH], hashed_password)
+    if not valid:
+        return False, None
+    if truncated:
+        new_hash = get_password_hash(plain_password)
+    return True, new_hash
 
 def get_password_hash(password: str) -> str:
-    # bcrypt has a 72 byte limit, so truncate if necessary
-    # For simplicity, we'll truncate to 50 characters to be safe
-    truncated_password = password[:50] if len(password) > 50 else password
-    return pwd_context.hash(truncated_password)
+    with tracer.span("auth.password_hash"):
+        return pwd_context.hash(password)
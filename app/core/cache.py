@@ -0,0 +1,276 @@
+"""
+Server-side cache for read endpoint responses
+
+Entries are keyed by the data they hold (e.g. one house's tasks, shared by
+all of its members; access checks stay outside the cache) and tagged with
+the houses and users they were built from; writes invalidate by tag.
+Concurrent misses for the same key share a single computation, which one
+of the waiting callers takes over if the computing one is cancelled.
+Invalidations are broadcast over the event bus so every worker process
+evicts the same entries.
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Set, Tuple
+from .config import settings
+from .events import RESET, event_bus
+
+MISSING = object()
+
+
+def house_tag(house_id: int) -> str:
+    return f"house:{house_id}"
+
+
+def user_tag(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+class CacheBackend:
+    """
+    Storage interface for cached responses; implement it to share the cache
+    between workers (e.g. on Redis)
+    """
+
+    def get(self, key: str) -> Any:
+        """
+        Return the cached value or MISSING
+        """
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, tags: Iterable[str]) -> None:
+        raise NotImplementedError
+
+    def invalidate_tags(self, tags: Iterable[str]) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class NullCacheBackend(CacheBackend):
+    def get(self, key: str) -> Any:
+        return MISSING
+
+    def set(self, key: str, value: Any, tags: Iterable[str]) -> None:
+        pass
+
+    def invalidate_tags(self, tags: Iterable[str]) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+
+class MemoryCacheBackend(CacheBackend):
+    """
+    In-process LRU with a TTL and a tag index
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Any, Tuple[str, ...]]]" = OrderedDict()
+        self._keys_by_tag: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            expires_at, value, _ = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, tags: Iterable[str]) -> None:
+        tags = tuple(tags)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value, tags)
+            for tag in tags:
+                self._keys_by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_tags(self, tags: Iterable[str]) -> None:
+        with self._lock:
+            for tag in tags:
+                for key in self._keys_by_tag.pop(tag, set()):
+                    self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_tag.clear()
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+
+class ResponseCache:
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Bumped on every invalidation, so results computed across one aren't stored
+        self._epoch = 0
+
+    async def get_or_compute(
+        self, key: str, compute: Callable[[], Awaitable[Tuple[Any, List[str]]]]
+    ) -> Any:
+        """
+        Return the cached value for `key`, or await `compute()` which returns
+        the value and the tags it depends on. Concurrent callers for the same
+        missing key wait for the first caller's computation.
+        """
+        while True:
+            value = self.backend.get(key)
+            if value is not MISSING:
+                return value
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            value = await self._follow(inflight)
+            if value is not MISSING:
+                return value
+            # The computing caller was cancelled (e.g. its client went away);
+            # take over, or follow whoever did first
+
+        future = self._lead(key)
+        epoch = self._epoch
+        try:
+            value, tags = await compute()
+        except BaseException as exc:
+            self._abandon(key, future, exc)
+            raise
+        self._settle(key, future, epoch, value, tags)
+        return value
+
+    async def get_or_compute_many(
+        self,
+        keys: Iterable[str],
+        compute: Callable[[List[str]], Awaitable[Dict[str, Tuple[Any, List[str]]]]]
+    ) -> Dict[str, Any]:
+        """
+        `get_or_compute` for several keys: `compute(missing)` returns the value
+        and tags of each key neither cached nor being computed by another
+        caller, so all of them are computed together.
+        """
+        values = {}
+        followed = {}
+        missing = []
+        for key in keys:
+            value = self.backend.get(key)
+            if value is not MISSING:
+                values[key] = value
+            elif key in self._inflight:
+                followed[key] = self._inflight[key]
+            else:
+                missing.append(key)
+
+        if missing:
+            futures = {key: self._lead(key) for key in missing}
+            epoch = self._epoch
+            try:
+                computed = await compute(missing)
+            except BaseException as exc:
+                for key, future in futures.items():
+                    self._abandon(key, future, exc)
+                raise
+            for key, future in futures.items():
+                value, tags = computed[key]
+                self._settle(key, future, epoch, value, tags)
+                values[key] = value
+
+        async def compute_one(key: str) -> Tuple[Any, List[str]]:
+            return (await compute([key]))[key]
+
+        for key, future in followed.items():
+            value = await self._follow(future)
+            if value is MISSING:
+                value = await self.get_or_compute(key, lambda key=key: compute_one(key))
+            values[key] = value
+        return values
+
+    @staticmethod
+    async def _follow(future: asyncio.Future) -> Any:
+        """
+        Wait for another caller's computation; MISSING if it was cancelled
+        """
+        # Unlike awaiting the future, waiting doesn't turn its cancellation
+        # into ours; our own cancellation still interrupts the wait
+        await asyncio.wait([future])
+        if future.cancelled():
+            return MISSING
+        return future.result()
+
+    def _lead(self, key: str) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        # Mark the exception retrieved when nobody else was waiting for it
+        future.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._inflight[key] = future
+        return future
+
+    def _settle(self, key: str, future: asyncio.Future, epoch: int, value: Any, tags: List[str]) -> None:
+        if epoch == self._epoch:
+            self.backend.set(key, value, tags)
+        future.set_result(value)
+        self._inflight.pop(key, None)
+
+    def _abandon(self, key: str, future: asyncio.Future, exc: BaseException) -> None:
+        # Waiters take over from a cancelled computation but share a failed one
+        if isinstance(exc, Exception):
+            future.set_exception(exc)
+        else:
+            future.cancel()
+        self._inflight.pop(key, None)
+
+    def invalidate(self, house_ids: Iterable[int] = (), user_ids: Iterable[int] = ()) -> None:
+        """
+        Evict entries built from these houses or users, here and in every other
+        worker process
+        """
+        house_ids, user_ids = list(house_ids), list(user_ids)
+        self.invalidate_local(house_ids, user_ids)
+        event_bus.publish({
+            "type": "cache.invalidate", "house_ids": house_ids, "user_ids": user_ids
+        })
+
+    def invalidate_local(self, house_ids: Iterable[int] = (), user_ids: Iterable[int] = ()) -> None:
+        self._epoch += 1
+        self.backend.invalidate_tags(
+            [house_tag(house_id) for house_id in house_ids] +
+            [user_tag(user_id) for user_id in user_ids]
+        )
+
+    def handle_event(self, event: dict) -> None:
+        if event["type"] == "cache.invalidate":
+            self.invalidate_local(event["house_ids"], event["user_ids"])
+        elif event["type"] == RESET:
+            self._epoch += 1
+            self.backend.clear()
+
+
+def get_cache_backend() -> CacheBackend:
+    if settings.RESPONSE_CACHE_BACKEND == "none":
+        return NullCacheBackend()
+    return MemoryCacheBackend(
+        settings.RESPONSE_CACHE_MAX_ENTRIES, settings.RESPONSE_CACHE_TTL_SECONDS
+    )
+
+
+response_cache = ResponseCache(get_cache_backend())
+event_bus.subscribe(response_cache.handle_event)
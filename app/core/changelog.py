@@ -0,0 +1,138 @@
+"""
+Change log backing the /sync endpoint
+
+Writes append entries inside their own transaction with `record_change`.
+Appends are serialized until the writer's transaction ends, so entries
+commit in id order and a /sync cursor never moves past an entry that is
+still to commit. `compact_change_log` keeps the log bounded; the job workers
+run it every `SYNC_COMPACTION_INTERVAL_SECONDS` (one of them per interval),
+and it runs once from the command line with `python -m app.core.changelog`.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import and_, delete, func, insert, select
+from sqlalchemy.orm import Session
+from .. import models
+from ..core import jobs
+from ..core.config import settings
+from ..db.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+TASK = "task"
+HOUSE = "house"
+LOG = "log"
+
+UPSERT = "upsert"
+DELETE = "delete"
+COMPACT = "compact"
+
+# Postgres advisory lock key serializing change log writers
+LOG_WRITER_LOCK = 0x6C6F67
+
+
+def lock_change_log(db: Session) -> None:
+    """
+    Hold the change log writer lock until the caller's transaction ends.
+
+    Ids come from a sequence at INSERT time but transactions may commit in
+    another order; a reader seeing id N+1 while N is still uncommitted would
+    hand out a cursor past N for good. Take the lock right before appending
+    and commit soon after, since it blocks every other writer.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(select(func.pg_advisory_xact_lock(LOG_WRITER_LOCK)))
+    # SQLite's database write lock already serializes writers
+
+
+def record_change(
+    db: Session,
+    entity: str,
+    entity_id: int,
+    op: str,
+    house_id: Optional[int] = None,
+    user_id: Optional[int] = None
+) -> None:
+    """
+    Append a change to the log as part of the caller's transaction.
+
+    Changes with a `user_id` are only visible to that user (e.g. the tombstone
+    for a house they left); all others are visible to members of `house_id`.
+    """
+    lock_change_log(db)
+    db.execute(
+        insert(models.ChangeLog).values(
+            entity=entity,
+            entity_id=entity_id,
+            op=op,
+            house_id=house_id,
+            user_id=user_id
+        )
+    )
+
+
+def get_horizon(db: Session) -> int:
+    """
+    Oldest cursor the log can still serve; older cursors need a full resync
+    """
+    return db.scalar(
+        select(func.max(models.ChangeLog.entity_id)).where(models.ChangeLog.entity == LOG)
+    ) or 0
+
+
+def compact_change_log(db: Session, retention: Optional[timedelta] = None) -> int:
+    """
+    Drop superseded entries and everything older than the retention window.
+    Returns the number of entries removed.
+    """
+    retention = retention or timedelta(days=settings.SYNC_LOG_RETENTION_DAYS)
+    log = models.ChangeLog
+
+    # Only the latest entry per entity (and audience) matters to a client
+    latest = select(func.max(log.id)).group_by(
+        log.entity, log.entity_id, func.coalesce(log.user_id, -1)
+    )
+    removed = db.execute(
+        delete(log).where(log.entity != LOG, log.id.not_in(latest))
+    ).rowcount
+
+    # Past the retention window, clients must resync; remember where that is
+    horizon = db.scalar(
+        select(func.max(log.id)).where(
+            log.entity != LOG,
+            log.created_at < datetime.utcnow() - retention
+        )
+    )
+    if horizon and horizon > get_horizon(db):
+        removed += db.execute(
+            delete(log).where(and_(log.entity != LOG, log.id <= horizon))
+        ).rowcount
+        db.execute(delete(log).where(log.entity == LOG))
+        record_change(db, LOG, horizon, COMPACT)
+
+    db.commit()
+    return removed
+
+
+@jobs.periodic_task("change_log.compact", settings.SYNC_COMPACTION_INTERVAL_SECONDS)
+def run_change_log_compaction() -> None:
+    """
+    Compact the change log in a session of its own; run by the job workers
+    """
+    db = SessionLocal()
+    try:
+        removed = compact_change_log(db)
+        if removed:
+            logger.info("Compacted %d change log entries", removed)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        print(f"Removed {compact_change_log(db)} change log entries")
+    finally:
+        db.close()
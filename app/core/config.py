@@ -1,8 +1,20 @@
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Union
 from pydantic import AnyHttpUrl, field_validator, ValidationInfo
 from pydantic_settings import BaseSettings
 
 
+def parse_limits(value: str) -> Dict[str, int]:
+    """
+    Parse "name=limit,name=limit" into a dict
+    """
+    limits = {}
+    for item in value.split(","):
+        if item.strip():
+            name, limit = item.split("=")
+            limits[name.strip()] = int(limit)
+    return limits
+
+
 class Settings(BaseSettings):
     # API
     API_V1_STR: str = "/api/v1"
@@ -23,10 +35,86 @@ class Settings(BaseSettings):
 
     # Database
     DATABASE_URL: str = "sqlite:///./flatmate.db"
+    # Comma-separated shard URLs for tasks, routed by house_id % N.
+    # Leave empty to keep tasks in DATABASE_URL.
+    SHARD_DATABASE_URLS: str = ""
+    # Executions of the same SQL on a connection before it is prepared
+    # server-side; only used by the psycopg 3 driver (postgresql+psycopg://)
+    DATABASE_PREPARE_THRESHOLD: int = 2
 
     # JWT
     ALGORITHM: str = "HS256"
 
+    # Idempotency keys for write endpoints ("memory" or "database" for multi-worker)
+    IDEMPOTENCY_BACKEND: str = "memory"
+    IDEMPOTENCY_TTL_SECONDS: int = 60 * 60 * 24  # 1 day
+    IDEMPOTENCY_MAX_ENTRIES: int = 10000
+
+    # Response cache for read endpoints ("memory" or "none")
+    RESPONSE_CACHE_BACKEND: str = "memory"
+    RESPONSE_CACHE_MAX_ENTRIES: int = 10000
+    RESPONSE_CACHE_TTL_SECONDS: int = 5 * 60
+
+    # Broadcast of cache invalidations between worker processes: "local" for a
+    # single process, "postgres" (LISTEN/NOTIFY) or "database" (polls a table,
+    # works on SQLite)
+    EVENT_BUS_BACKEND: str = "local"
+    EVENT_BUS_POLL_INTERVAL_SECONDS: float = 0.05
+    EVENT_BUS_RETENTION_SECONDS: int = 60
+
+    # Archival of completed tasks into tasks_archive
+    TASK_ARCHIVE_ENABLED: bool = True
+    TASK_ARCHIVE_AFTER_DAYS: int = 30
+    TASK_ARCHIVE_BATCH_SIZE: int = 500
+    TASK_ARCHIVE_INTERVAL_SECONDS: int = 60 * 60  # 1 hour
+
+    # Delta sync change log
+    SYNC_LOG_RETENTION_DAYS: int = 30
+    SYNC_COMPACTION_INTERVAL_SECONDS: int = 60 * 60  # 1 hour
+
+    # Background jobs run by `python -m app.worker`
+    JOB_WORKER_POOL: str = "thread"  # "thread" or "process"
+    JOB_WORKER_CONCURRENCY: int = 4
+    # Per-kind limits within one worker, e.g. "tasks.import=1,tasks.export=2"
+    JOB_KIND_CONCURRENCY: str = ""
+
+    @property
+    def JOB_KIND_LIMITS(self) -> Dict[str, int]:
+        return parse_limits(self.JOB_KIND_CONCURRENCY)
+
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BACKOFF_SECONDS: int = 30  # Doubled after every failed attempt
+    JOB_VISIBILITY_TIMEOUT_SECONDS: int = 10 * 60  # Running jobs past this are retried
+    JOB_POLL_INTERVAL_SECONDS: float = 1.0
+
+    # Adaptive in-flight request limits per route class (auth, reads, writes);
+    # requests over the limit get a 503
+    CONCURRENCY_LIMIT_ENABLED: bool = True
+    CONCURRENCY_LIMITS: str = "auth=8,reads=64,writes=32"  # Initial limits
+
+    @property
+    def CONCURRENCY_INITIAL_LIMITS(self) -> Dict[str, int]:
+        return parse_limits(self.CONCURRENCY_LIMITS)
+
+    CONCURRENCY_MIN_LIMIT: int = 2
+    CONCURRENCY_MAX_LIMIT: int = 512
+    CONCURRENCY_LATENCY_TOLERANCE: float = 2.0  # Back off above this multiple of usual latency
+    CONCURRENCY_BACKOFF_RATIO: float = 0.9
+    CONCURRENCY_RETRY_AFTER_SECONDS: int = 1
+
+    # Request tracing: fraction of requests traced, and "stdout" or a file path
+    TRACING_ENABLED: bool = False
+    TRACE_SAMPLE_RATE: float = 0.01
+    TRACE_EXPORT: str = "stdout"
+
+    # Password hashing: passlib scheme for new hashes ("pbkdf2_sha256",
+    # "bcrypt" or "argon2", which needs argon2-cffi) and its rounds (time cost
+    # for argon2; 0 keeps passlib's default). Pick rounds for this host with
+    # `python -m app.core.password_tuning`. Hashes with another scheme or cost
+    # are rehashed on the user's next successful login.
+    PASSWORD_HASH_SCHEME: str = "pbkdf2_sha256"
+    PASSWORD_HASH_ROUNDS: int = 0
+
     # Environment
     ENVIRONMENT: str = "development"
 
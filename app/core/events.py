@@ -0,0 +1,198 @@
+"""
+Event bus broadcasting change events between worker processes
+
+Writes publish an event after committing; every process running the API
+subscribes and applies events from the others, so per-process state such as
+the response cache stays consistent with `uvicorn --workers N` and with the
+job worker. Backends (`EVENT_BUS_BACKEND`):
+
+- "local": single process, events are only delivered in-process
+- "postgres": `NOTIFY` on publish, a dedicated `LISTEN` connection per process
+- "database": events are rows in `invalidation_events` polled every
+  `EVENT_BUS_POLL_INTERVAL_SECONDS`; works on SQLite for local setups.
+  Publishers take turns like change log writers, so events commit in id
+  order and a poll never moves past one that is still to commit.
+"""
+import asyncio
+import json
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Tuple
+from sqlalchemy import delete, func, insert, select, text
+from starlette.concurrency import run_in_threadpool
+from .. import models
+from ..core.config import settings
+from ..db.session import engine
+
+logger = logging.getLogger(__name__)
+
+# Identifies events published by this process, which it has already applied
+ORIGIN = uuid.uuid4().hex
+
+# Delivered when events may have been missed (e.g. a lost LISTEN connection)
+RESET = "reset"
+
+# pg_advisory_xact_lock key serializing publishers of the database backend
+EVENT_WRITER_LOCK = 0x657674
+
+Handler = Callable[[Dict[str, Any]], None]
+
+
+class EventBus:
+    def __init__(self):
+        self._handlers: List[Handler] = []
+
+    def subscribe(self, handler: Handler) -> None:
+        """
+        Call `handler(event)` for events published by other processes
+        """
+        self._handlers.append(handler)
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        """
+        Send an event to the other processes; call after committing. Failures
+        are logged rather than failing the already committed write.
+        """
+        try:
+            self._send(json.dumps({**event, "origin": ORIGIN}))
+        except Exception:
+            logger.exception("Publishing %s failed", event.get("type"))
+
+    def _send(self, payload: str) -> None:
+        raise NotImplementedError
+
+    async def run(self) -> None:
+        """
+        Receive events until cancelled; started with the application
+        """
+
+    def _deliver(self, event: Dict[str, Any]) -> None:
+        if event.get("origin") == ORIGIN:
+            return
+        for handler in self._handlers:
+            try:
+                handler(event)
+            except Exception:
+                logger.exception("Event handler failed for %s", event.get("type"))
+
+
+class LocalEventBus(EventBus):
+    def _send(self, payload: str) -> None:
+        pass
+
+
+class PostgresEventBus(EventBus):
+    CHANNEL = "flatmate_events"
+    # NOTIFY payloads must stay under 8000 bytes
+    MAX_PAYLOAD = 7900
+
+    def _send(self, payload: str) -> None:
+        if len(payload) > self.MAX_PAYLOAD:
+            payload = json.dumps({"type": RESET, "origin": ORIGIN})
+        with engine.connect() as connection:
+            connection.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": self.CHANNEL, "payload": payload}
+            )
+            connection.commit()
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            connection = None
+            try:
+                connection = engine.raw_connection()
+                driver_connection = connection.driver_connection
+                driver_connection.autocommit = True
+                driver_connection.cursor().execute(f"LISTEN {self.CHANNEL}")
+                # Anything sent while not listening is lost
+                self._deliver({"type": RESET})
+
+                broken = loop.create_future()
+
+                def on_readable():
+                    try:
+                        driver_connection.poll()
+                    except Exception as exc:
+                        loop.remove_reader(driver_connection.fileno())
+                        if not broken.done():
+                            broken.set_exception(exc)
+                        return
+                    while driver_connection.notifies:
+                        notify = driver_connection.notifies.pop(0)
+                        self._deliver(json.loads(notify.payload))
+
+                loop.add_reader(driver_connection.fileno(), on_readable)
+                await broken
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Lost the event bus connection, reconnecting")
+                await asyncio.sleep(1)
+            finally:
+                if connection is not None:
+                    try:
+                        loop.remove_reader(connection.driver_connection.fileno())
+                    except Exception:
+                        pass
+                    connection.invalidate()
+
+
+class DatabaseEventBus(EventBus):
+    def _send(self, payload: str) -> None:
+        with engine.begin() as connection:
+            # As in changelog.lock_change_log: ids are taken at INSERT but may
+            # commit out of order, and `_poll` would skip the late one
+            if connection.dialect.name == "postgresql":
+                connection.execute(select(func.pg_advisory_xact_lock(EVENT_WRITER_LOCK)))
+            connection.execute(insert(models.InvalidationEvent).values(payload=payload))
+
+    def _latest_id(self) -> int:
+        with engine.connect() as connection:
+            return connection.scalar(select(func.max(models.InvalidationEvent.id))) or 0
+
+    def _poll(self, last_id: int) -> List[Tuple[int, str]]:
+        with engine.connect() as connection:
+            return connection.execute(
+                select(models.InvalidationEvent.id, models.InvalidationEvent.payload).where(
+                    models.InvalidationEvent.id > last_id
+                ).order_by(models.InvalidationEvent.id)
+            ).all()
+
+    def _prune(self) -> None:
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.EVENT_BUS_RETENTION_SECONDS)
+        with engine.begin() as connection:
+            connection.execute(
+                delete(models.InvalidationEvent).where(models.InvalidationEvent.created_at < cutoff)
+            )
+
+    async def run(self) -> None:
+        last_id = None
+        polls = 0
+        while True:
+            try:
+                if last_id is None:
+                    # Start from the newest event; earlier ones predate this process
+                    last_id = await run_in_threadpool(self._latest_id)
+                for event_id, payload in await run_in_threadpool(self._poll, last_id):
+                    last_id = event_id
+                    self._deliver(json.loads(payload))
+                polls += 1
+                if polls * settings.EVENT_BUS_POLL_INTERVAL_SECONDS >= settings.EVENT_BUS_RETENTION_SECONDS:
+                    polls = 0
+                    await run_in_threadpool(self._prune)
+            except Exception:
+                logger.exception("Polling the event bus failed")
+            await asyncio.sleep(settings.EVENT_BUS_POLL_INTERVAL_SECONDS)
+
+
+def get_event_bus() -> EventBus:
+    if settings.EVENT_BUS_BACKEND == "postgres":
+        return PostgresEventBus()
+    if settings.EVENT_BUS_BACKEND == "database":
+        return DatabaseEventBus()
+    return LocalEventBus()
+
+
+event_bus = get_event_bus()
@@ -0,0 +1,281 @@
+import asyncio
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from jose import JWTError
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from . import auth
+from .config import settings
+
+IDEMPOTENCY_HEADER = "idempotency-key"
+REPLAYED_HEADER = b"idempotent-replayed"
+
+
+@dataclass
+class StoredResponse:
+    fingerprint: str
+    status_code: Optional[int] = None  # None while the first request is still running
+    headers: List[Tuple[str, str]] = field(default_factory=list)
+    body: bytes = b""
+
+    @property
+    def pending(self) -> bool:
+        return self.status_code is None
+
+
+class MemoryIdempotencyStore:
+    """
+    Bounded, TTL-expiring in-process store. Only deduplicates within one worker.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[datetime, StoredResponse]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def begin(self, key: str, fingerprint: str) -> Optional[StoredResponse]:
+        now = datetime.utcnow()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                return entry[1]
+            self._entries[key] = (now + self.ttl, StoredResponse(fingerprint=fingerprint))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return None
+
+    def complete(self, key: str, response: StoredResponse) -> None:
+        with self._lock:
+            self._entries[key] = (datetime.utcnow() + self.ttl, response)
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class DatabaseIdempotencyStore:
+    """
+    Store backed by the idempotency_keys table, shared by all workers.
+
+    The primary key on the hashed key doubles as the reservation lock, so
+    concurrent duplicates hitting different workers still write only once.
+    """
+
+    PURGE_EVERY = 100
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self._calls = 0
+
+    def _session(self):
+        from ..db.session import SessionLocal
+        return SessionLocal()
+
+    def begin(self, key: str, fingerprint: str) -> Optional[StoredResponse]:
+        from ..models import IdempotencyKey
+
+        now = datetime.utcnow()
+        db = self._session()
+        try:
+            self._calls += 1
+            if self._calls % self.PURGE_EVERY == 0:
+                db.query(IdempotencyKey).filter(IdempotencyKey.expires_at < now).delete()
+            else:
+                db.query(IdempotencyKey).filter(
+                    IdempotencyKey.key == key,
+                    IdempotencyKey.expires_at < now
+                ).delete()
+            db.add(IdempotencyKey(key=key, fingerprint=fingerprint, expires_at=now + self.ttl))
+            try:
+                db.commit()
+                return None
+            except IntegrityError:
+                db.rollback()
+
+            row = db.query(IdempotencyKey).filter(IdempotencyKey.key == key).first()
+            if row is None:
+                # Expired and purged between our insert and read; treat as in flight
+                return StoredResponse(fingerprint=fingerprint)
+            return StoredResponse(
+                fingerprint=row.fingerprint,
+                status_code=row.status_code,
+                headers=[tuple(pair) for pair in json.loads(row.headers or "[]")],
+                body=row.body or b""
+            )
+        finally:
+            db.close()
+
+    def complete(self, key: str, response: StoredResponse) -> None:
+        from ..models import IdempotencyKey
+
+        db = self._session()
+        try:
+            db.query(IdempotencyKey).filter(IdempotencyKey.key == key).update({
+                "status_code": response.status_code,
+                "headers": json.dumps(response.headers),
+                "body": response.body,
+                "expires_at": datetime.utcnow() + self.ttl
+            })
+            db.commit()
+        finally:
+            db.close()
+
+    def release(self, key: str) -> None:
+        from ..models import IdempotencyKey
+
+        db = self._session()
+        try:
+            db.query(IdempotencyKey).filter(IdempotencyKey.key == key).delete()
+            db.commit()
+        finally:
+            db.close()
+
+
+def caller_scope(headers: Headers) -> str:
+    """
+    The user id of a valid bearer token, so a retry with a refreshed token
+    still matches; otherwise the raw Authorization header
+    """
+    authorization = headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer":
+        try:
+            subject = auth.decode_access_token(token).get("sub")
+        except JWTError:
+            subject = None
+        if subject is not None:
+            return f"user:{subject}"
+    return f"header:{authorization}"
+
+
+def get_idempotency_store():
+    if settings.IDEMPOTENCY_BACKEND == "database":
+        return DatabaseIdempotencyStore(settings.IDEMPOTENCY_TTL_SECONDS)
+    return MemoryIdempotencyStore(
+        settings.IDEMPOTENCY_TTL_SECONDS, settings.IDEMPOTENCY_MAX_ENTRIES
+    )
+
+
+class IdempotencyMiddleware:
+    """
+    Replay the first response for POST requests repeated with the same
+    Idempotency-Key header, so client retries never run the write twice.
+
+    Keys are scoped to the user the bearer token was issued to. Reusing a key with
+    a different request is rejected with 422; a duplicate that arrives while
+    the first request is still running gets 409. Server errors are not
+    stored, so the client can retry them.
+    """
+
+    def __init__(self, app, paths: List[str], store=None):
+        self.app = app
+        self.paths = set(paths)
+        self.store = store or get_idempotency_store()
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        idempotency_key = headers.get(IDEMPOTENCY_HEADER)
+        if not idempotency_key:
+            await self.app(scope, receive, send)
+            return
+
+        body = await self._read_body(receive)
+        key = hashlib.sha256(f"{caller_scope(headers)}\n{idempotency_key}".encode()).hexdigest()
+        fingerprint = hashlib.sha256(
+            b"\n".join([scope["path"].encode(), scope.get("query_string", b""), body])
+        ).hexdigest()
+
+        # Serialize duplicates within this worker; the store handles other workers
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        try:
+            async with lock:
+                await self._handle(scope, receive, send, key, fingerprint, body)
+        finally:
+            if not lock.locked():
+                self._locks.pop(key, None)
+
+    async def _handle(self, scope, receive, send, key, fingerprint, body):
+        stored = await run_in_threadpool(self.store.begin, key, fingerprint)
+        if stored is not None:
+            if stored.fingerprint != fingerprint:
+                response = JSONResponse(
+                    {"detail": "Idempotency-Key was already used for a different request"},
+                    status_code=422
+                )
+            elif stored.pending:
+                response = JSONResponse(
+                    {"detail": "A request with this Idempotency-Key is already in progress"},
+                    status_code=409
+                )
+            else:
+                await self._replay(send, stored)
+                return
+            await response(scope, receive, send)
+            return
+
+        captured = StoredResponse(fingerprint=fingerprint)
+        chunks = []
+
+        async def replay_receive():
+            nonlocal body
+            if body is not None:
+                message = {"type": "http.request", "body": body, "more_body": False}
+                body = None
+                return message
+            return await receive()
+
+        async def capture_send(message):
+            if message["type"] == "http.response.start":
+                captured.status_code = message["status"]
+                captured.headers = [
+                    (name.decode("latin-1"), value.decode("latin-1"))
+                    for name, value in message.get("headers", [])
+                ]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except Exception:
+            await run_in_threadpool(self.store.release, key)
+            raise
+
+        if captured.status_code is None or captured.status_code >= 500:
+            await run_in_threadpool(self.store.release, key)
+        else:
+            captured.body = b"".join(chunks)
+            await run_in_threadpool(self.store.complete, key, captured)
+
+    async def _replay(self, send, stored: StoredResponse):
+        headers = [
+            (name.encode("latin-1"), value.encode("latin-1"))
+            for name, value in stored.headers
+        ]
+        headers.append((REPLAYED_HEADER, b"true"))
+        await send({"type": "http.response.start", "status": stored.status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": stored.body})
+
+    @staticmethod
+    async def _read_body(receive) -> bytes:
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        return b"".join(chunks)
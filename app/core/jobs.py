@@ -0,0 +1,261 @@
+"""
+Persistent background job queue
+
+Request handlers `enqueue` a job inside their transaction and return `202`;
+`python -m app.worker` claims queued jobs and runs the handler registered
+for their kind with `job_handler`. Claiming is a single UPDATE ... RETURNING
+that marks the job running until its visibility timeout, so jobs of a worker
+that died are picked up again. Failed jobs are retried with exponential
+backoff until `max_attempts` is reached.
+
+Jobs run at least once: handlers commit their own work and must be safe to
+run again for the same payload. Handlers whose work isn't naturally
+repeatable call `mark_applied` in the transaction of that work.
+
+Maintenance registered with `periodic_task` runs on the workers too. Each
+occurrence is claimed through the `periodic_runs` table, so however many
+workers share the database, one of them runs it per interval.
+"""
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import and_, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from .. import models
+from ..core.config import settings
+from ..db.session import SessionLocal
+from ..db.shards import ShardSessions
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+Handler = Callable[[ShardSessions, Dict[str, Any], int], Optional[Any]]
+
+_handlers: Dict[str, Handler] = {}
+
+_periodic: Dict[str, Tuple[float, Callable[[], Any]]] = {}
+
+
+def job_handler(kind: str) -> Callable[[Handler], Handler]:
+    """
+    Register a function as the handler for jobs of `kind`. It is called with
+    the worker's sessions, the job payload and the job id; its return value
+    is stored as the job result.
+    """
+    def register(handler: Handler) -> Handler:
+        _handlers[kind] = handler
+        return handler
+    return register
+
+
+def registered_kinds() -> List[str]:
+    return list(_handlers)
+
+
+def periodic_task(name: str, interval_seconds: float) -> Callable[[Callable[[], Any]], Callable[[], Any]]:
+    """
+    Register a function for the workers to run every `interval_seconds`
+    """
+    def register(func: Callable[[], Any]) -> Callable[[], Any]:
+        _periodic[name] = (interval_seconds, func)
+        return func
+    return register
+
+
+def periodic_tasks() -> Dict[str, float]:
+    """
+    Name -> interval in seconds of the registered periodic tasks
+    """
+    return {name: interval for name, (interval, _) in _periodic.items()}
+
+
+def claim_periodic(db: Session, name: str, interval_seconds: float) -> bool:
+    """
+    Atomically take the occurrence of a periodic task that is due, if any,
+    moving its next run `interval_seconds` ahead
+    """
+    now = datetime.utcnow()
+    claimed = db.execute(
+        update(models.PeriodicRun).where(
+            models.PeriodicRun.name == name,
+            models.PeriodicRun.next_run_at <= now
+        ).values(next_run_at=now + timedelta(seconds=interval_seconds))
+    ).rowcount
+    if not claimed and db.get(models.PeriodicRun, name) is None:
+        # First run ever; of several workers inserting it, one wins
+        try:
+            db.execute(insert(models.PeriodicRun).values(
+                name=name, next_run_at=now + timedelta(seconds=interval_seconds)
+            ))
+            claimed = 1
+        except IntegrityError:
+            db.rollback()
+    db.commit()
+    return bool(claimed)
+
+
+def run_periodic(name: str) -> None:
+    """
+    Run a claimed periodic task; executed on the worker's thread or process pool
+    """
+    _, func = _periodic[name]
+    try:
+        func()
+    except Exception:
+        logger.exception("Periodic task %s failed", name)
+
+
+def enqueue(
+    db: Session,
+    kind: str,
+    payload: Dict[str, Any],
+    user_id: Optional[int] = None,
+    max_attempts: Optional[int] = None
+) -> models.Job:
+    """
+    Queue a job as part of the caller's transaction; `user_id` may poll it
+    """
+    return db.scalars(
+        insert(models.Job).values(
+            kind=kind,
+            payload=json.dumps(payload),
+            status=QUEUED,
+            user_id=user_id,
+            attempts=0,
+            max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+            run_after=datetime.utcnow()
+        ).returning(models.Job)
+    ).one()
+
+
+def mark_applied(session: Session, job_id: int) -> bool:
+    """
+    Record that a job's work is done, inside the transaction of `session`
+    holding that work. Returns False when an earlier attempt already
+    committed it; an attempt running concurrently fails on commit instead.
+    """
+    if session.scalar(select(models.AppliedJob.job_id).where(models.AppliedJob.job_id == job_id)):
+        return False
+    session.execute(insert(models.AppliedJob).values(job_id=job_id))
+    return True
+
+
+def _claimable(now: datetime):
+    return or_(
+        and_(models.Job.status == QUEUED, models.Job.run_after <= now),
+        # Running jobs whose worker stopped renewing the claim
+        and_(models.Job.status == RUNNING, models.Job.locked_until < now)
+    )
+
+
+def claim_job(db: Session, kinds: Iterable[str]) -> Optional[models.Job]:
+    """
+    Atomically take the next due job of one of `kinds`, or return None
+    """
+    kinds = list(kinds)
+    if not kinds:
+        return None
+
+    now = datetime.utcnow()
+    # SKIP LOCKED lets Postgres workers claim different jobs concurrently;
+    # SQLite ignores it and serializes the UPDATE instead
+    next_job = select(models.Job.id).where(
+        _claimable(now), models.Job.kind.in_(kinds)
+    ).order_by(
+        models.Job.run_after, models.Job.id
+    ).limit(1).with_for_update(skip_locked=True).scalar_subquery()
+
+    job = db.scalars(
+        update(models.Job).where(
+            models.Job.id == next_job,
+            _claimable(now)
+        ).values(
+            status=RUNNING,
+            attempts=models.Job.attempts + 1,
+            locked_until=now + timedelta(seconds=settings.JOB_VISIBILITY_TIMEOUT_SECONDS)
+        ).returning(models.Job),
+        execution_options={"synchronize_session": False}
+    ).first()
+    db.commit()
+    return job
+
+
+def renew_claims(db: Session, claims: Iterable[Tuple[int, int]]) -> None:
+    """
+    Push back the visibility timeout of jobs still running, given as
+    (job id, attempt) pairs
+    """
+    locked_until = datetime.utcnow() + timedelta(seconds=settings.JOB_VISIBILITY_TIMEOUT_SECONDS)
+    for job_id, attempt in claims:
+        db.execute(
+            update(models.Job).where(
+                models.Job.id == job_id,
+                models.Job.status == RUNNING,
+                models.Job.attempts == attempt
+            ).values(locked_until=locked_until)
+        )
+    db.commit()
+
+
+def _finish(db: Session, job_id: int, attempt: int, **values: Any) -> None:
+    # Only the worker holding the current attempt may record its outcome
+    updated = db.execute(
+        update(models.Job).where(
+            models.Job.id == job_id,
+            models.Job.status == RUNNING,
+            models.Job.attempts == attempt
+        ).values(locked_until=None, **values)
+    ).rowcount
+    db.commit()
+    if not updated:
+        logger.warning("Job %d attempt %d lost its claim before finishing", job_id, attempt)
+
+
+def run_job(job_id: int, attempt: int) -> None:
+    """
+    Run one claimed job attempt and record its outcome; executed on the
+    worker's thread or process pool
+    """
+    db = SessionLocal()
+    shards = ShardSessions(db)
+    try:
+        job = db.get(models.Job, job_id)
+        if job is None or job.status != RUNNING or job.attempts != attempt:
+            return
+
+        now = datetime.utcnow()
+        if attempt > job.max_attempts:
+            # The last attempt's worker died without recording an outcome
+            _finish(db, job_id, attempt, status=FAILED, finished_at=now,
+                    error="Worker stopped while running the job")
+            return
+
+        handler = _handlers.get(job.kind)
+        try:
+            if handler is None:
+                raise LookupError(f"No handler registered for job kind {job.kind!r}")
+            result = handler(shards, json.loads(job.payload), job_id)
+        except Exception as exc:
+            shards.rollback()
+            logger.exception("Job %d (%s) attempt %d failed", job_id, job.kind, attempt)
+            error = f"{type(exc).__name__}: {exc}"
+            if attempt < job.max_attempts:
+                backoff = settings.JOB_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1)
+                _finish(db, job_id, attempt, status=QUEUED, error=error,
+                        run_after=datetime.utcnow() + timedelta(seconds=backoff))
+            else:
+                _finish(db, job_id, attempt, status=FAILED, error=error,
+                        finished_at=datetime.utcnow())
+            return
+
+        _finish(db, job_id, attempt, status=SUCCEEDED, error=None,
+                result=json.dumps(result, default=str), finished_at=datetime.utcnow())
+    finally:
+        shards.close()
+        db.close()
@@ -0,0 +1,155 @@
+"""
+Adaptive concurrency limits with load shedding
+
+Requests are split into route classes (auth, reads, writes), each with its
+own cap on in-flight requests. Caps adapt AIMD-style to observed latency:
+while requests finish within `CONCURRENCY_LATENCY_TOLERANCE` times the
+long-term latency the cap grows by about one per cap's worth of requests,
+and once they get slower it is cut by `CONCURRENCY_BACKOFF_RATIO`. Requests
+over the cap get an immediate 503 instead of queueing for the database or
+the password hasher.
+
+Limits are per process; the event loop runs the middleware, so no locking
+is needed.
+"""
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+from starlette.responses import JSONResponse
+from .config import settings
+
+AUTH = "auth"
+READS = "reads"
+WRITES = "writes"
+
+# Weights of the newest latency sample in the short and long-term averages
+SHORT_ALPHA = 0.1
+LONG_ALPHA = 0.01
+
+
+class AdaptiveLimit:
+    def __init__(
+        self,
+        initial: int,
+        min_limit: int,
+        max_limit: int,
+        tolerance: float,
+        backoff_ratio: float
+    ):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.backoff_ratio = backoff_ratio
+        self.in_flight = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.latency: Optional[float] = None  # Short-term average, seconds
+        self.baseline: Optional[float] = None  # Long-term average, seconds
+        self._next_decrease = 0.0
+
+    def try_acquire(self) -> bool:
+        if self.in_flight >= int(self.limit):
+            self.rejected += 1
+            return False
+        self.in_flight += 1
+        self.accepted += 1
+        return True
+
+    def release(self, latency: float) -> None:
+        """
+        Finish a request that took `latency` seconds and adapt the limit
+        """
+        self.in_flight -= 1
+        if self.baseline is None:
+            self.latency = self.baseline = latency
+            return
+
+        self.latency += SHORT_ALPHA * (latency - self.latency)
+        self.baseline += LONG_ALPHA * (latency - self.baseline)
+        now = time.monotonic()
+        if self.latency > self.baseline * self.tolerance:
+            # Back off at most once per round trip, so requests admitted under
+            # the old limit don't shrink it again
+            if now >= self._next_decrease:
+                self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+                self._next_decrease = now + self.latency
+        elif self.in_flight + 1 >= self.limit / 2:
+            # Only grow a limit that is actually being used
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "latency_ms": round(self.latency * 1000, 3) if self.latency is not None else None,
+            "baseline_ms": round(self.baseline * 1000, 3) if self.baseline is not None else None
+        }
+
+
+def create_limits() -> Dict[str, AdaptiveLimit]:
+    return {
+        route_class: AdaptiveLimit(
+            initial,
+            settings.CONCURRENCY_MIN_LIMIT,
+            settings.CONCURRENCY_MAX_LIMIT,
+            settings.CONCURRENCY_LATENCY_TOLERANCE,
+            settings.CONCURRENCY_BACKOFF_RATIO
+        )
+        for route_class, initial in settings.CONCURRENCY_INITIAL_LIMITS.items()
+    }
+
+
+limits = create_limits()
+
+
+def classify_request(scope) -> str:
+    if "/auth/" in scope["path"]:
+        return AUTH
+    if scope["method"] in ("GET", "HEAD"):
+        return READS
+    return WRITES
+
+
+class ConcurrencyLimitMiddleware:
+    """
+    Reject requests over their route class's adaptive limit with a fast 503
+    """
+
+    def __init__(
+        self,
+        app,
+        exempt_paths: Iterable[str] = (),
+        limits: Dict[str, AdaptiveLimit] = limits,
+        classify: Callable[[Any], str] = classify_request
+    ):
+        self.app = app
+        self.exempt_paths = set(exempt_paths)
+        self.limits = limits
+        self.classify = classify
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.limits.get(self.classify(scope))
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not limit.try_acquire():
+            response = JSONResponse(
+                {"detail": "Server is overloaded, please retry"},
+                status_code=503,
+                headers={"Retry-After": str(settings.CONCURRENCY_RETRY_AFTER_SECONDS)}
+            )
+            await response(scope, receive, send)
+            return
+
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limit.release(time.monotonic() - started)
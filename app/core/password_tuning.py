@@ -0,0 +1,83 @@
+"""
+Pick password hashing rounds for this host
+
+Run with `python -m app.core.password_tuning [--scheme argon2] [--target-ms 100]`
+on the machine (or instance type) that serves logins. It times verification
+and scales the cost until one verify takes about the target latency, then
+prints the settings to put in `.env`. Existing hashes move to the new cost
+as users log in.
+"""
+import argparse
+import math
+import statistics
+import time
+from passlib.exc import MissingBackendError
+from passlib.registry import get_crypt_handler
+from .config import settings
+
+DEFAULT_TARGET_MS = 100
+
+SAMPLE_PASSWORD = "correct horse battery staple"
+
+# bcrypt rounds are log2 of the work; the other schemes' cost is linear
+LOG2_COST_SCHEMES = {"bcrypt"}
+
+
+def measure_verify(scheme: str, rounds: int, samples: int = 5) -> float:
+    """
+    Median seconds to verify a password hashed with `scheme` at `rounds`
+    """
+    handler = get_crypt_handler(scheme).using(rounds=rounds)
+    password_hash = handler.hash(SAMPLE_PASSWORD)
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        handler.verify(SAMPLE_PASSWORD, password_hash)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def tune_rounds(scheme: str, target_seconds: float, max_steps: int = 8) -> int:
+    """
+    Rounds for `scheme` whose verify takes about `target_seconds` on this host
+    """
+    handler = get_crypt_handler(scheme)
+    min_rounds, max_rounds = handler.min_rounds, handler.max_rounds
+    rounds = handler.default_rounds
+    for _ in range(max_steps):
+        elapsed = measure_verify(scheme, rounds)
+        if scheme in LOG2_COST_SCHEMES:
+            # Whole doublings only; round down so logins stay within the target
+            proposed = rounds + math.floor(math.log2(target_seconds / elapsed))
+            tolerance = 0
+        else:
+            proposed = round(rounds * target_seconds / elapsed)
+            tolerance = rounds // 20
+        proposed = max(min_rounds, min(max_rounds, proposed))
+        if abs(proposed - rounds) <= tolerance:
+            return proposed
+        rounds = proposed
+    return rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pick password hashing rounds for this host")
+    parser.add_argument("--scheme", default=settings.PASSWORD_HASH_SCHEME, help="default %(default)s")
+    parser.add_argument(
+        "--target-ms", type=float, default=DEFAULT_TARGET_MS,
+        help="verify latency to aim for in milliseconds (default %(default)s)"
+    )
+    args = parser.parse_args()
+
+    try:
+        rounds = tune_rounds(args.scheme, args.target_ms / 1000)
+    except MissingBackendError as exc:
+        raise SystemExit(f"No backend for {args.scheme}: {exc}")
+    elapsed = measure_verify(args.scheme, rounds)
+    print(f"{args.scheme} at {rounds} rounds verifies in {elapsed * 1000:.1f} ms")
+    print(f"PASSWORD_HASH_SCHEME={args.scheme}")
+    print(f"PASSWORD_HASH_ROUNDS={rounds}")
+
+
+if __name__ == "__main__":
+    main()
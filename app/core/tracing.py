@@ -0,0 +1,216 @@
+"""
+Lightweight span tracing for request phases
+
+Spans follow the OpenTelemetry data model (128-bit trace ids, 64-bit span
+ids, parent links, nanosecond timestamps, attributes) and are written as
+one JSON object per line to stdout or a file, so no collector is needed.
+Sampling is decided once per request; unsampled requests only pay for a
+context variable lookup per instrumented call.
+"""
+import json
+import random
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+from fastapi.responses import JSONResponse
+from .config import settings
+
+
+class Span:
+    __slots__ = (
+        "trace_id", "span_id", "parent_span_id", "name", "attributes",
+        "start_time_unix_nano", "end_time_unix_nano", "status", "_trace"
+    )
+
+    def __init__(self, name: str, trace: List["Span"], trace_id: str, parent: Optional["Span"] = None):
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent.span_id if parent else None
+        self.name = name
+        self.attributes: Dict[str, Any] = {}
+        self.start_time_unix_nano = time.time_ns()
+        self.end_time_unix_nano: Optional[int] = None
+        self.status = "UNSET"
+        self._trace = trace
+        trace.append(self)
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def end(self) -> None:
+        self.end_time_unix_nano = time.time_ns()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_span_id,
+            "name": self.name,
+            "startTimeUnixNano": self.start_time_unix_nano,
+            "endTimeUnixNano": self.end_time_unix_nano,
+            "durationMs": round((self.end_time_unix_nano - self.start_time_unix_nano) / 1e6, 3),
+            "attributes": self.attributes,
+            "status": self.status
+        }
+
+
+class JsonLinesExporter:
+    """
+    Write finished traces as JSON lines to stdout or a file
+    """
+
+    def __init__(self, destination: str):
+        self.destination = destination
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]) -> None:
+        lines = "".join(json.dumps(span.to_dict(), default=str) + "\n" for span in spans)
+        with self._lock:
+            if self.destination == "stdout":
+                sys.stdout.write(lines)
+                sys.stdout.flush()
+            else:
+                with open(self.destination, "a") as file:
+                    file.write(lines)
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    def __init__(self, enabled: bool, sample_rate: float, exporter: JsonLinesExporter):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+
+    @contextmanager
+    def start_trace(self, name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+        """
+        Start a root span if this trace is sampled; export it when it ends
+        """
+        if not self.enabled or random.random() >= self.sample_rate:
+            yield None
+            return
+
+        trace: List[Span] = []
+        root = Span(name, trace, secrets.token_hex(16))
+        root.attributes.update(attributes)
+        token = _current_span.set(root)
+        try:
+            yield root
+        except BaseException:
+            root.status = "ERROR"
+            raise
+        finally:
+            root.end()
+            _current_span.reset(token)
+            self.exporter.export(trace)
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+        """
+        Record a child of the current span; a no-op outside a sampled trace
+        """
+        parent = _current_span.get()
+        if parent is None:
+            yield None
+            return
+
+        span = Span(name, parent._trace, parent.trace_id, parent)
+        span.attributes.update(attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException:
+            span.status = "ERROR"
+            raise
+        finally:
+            span.end()
+            _current_span.reset(token)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+tracer = Tracer(
+    settings.TRACING_ENABLED,
+    settings.TRACE_SAMPLE_RATE,
+    JsonLinesExporter(settings.TRACE_EXPORT)
+)
+
+
+def instrument_engine(engine) -> None:
+    """
+    Record a span with timing for every SQL statement run on `engine`
+    """
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        parent = _current_span.get()
+        if parent is None:
+            return
+        span = Span("db.query", parent._trace, parent.trace_id, parent)
+        span.attributes["db.system"] = engine.dialect.name
+        span.attributes["db.statement"] = statement
+        conn.info.setdefault("trace_spans", []).append(span)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get("trace_spans")
+        if spans:
+            spans.pop().end()
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        spans = exception_context.connection.info.get("trace_spans") if exception_context.connection else None
+        if spans:
+            span = spans.pop()
+            span.status = "ERROR"
+            span.end()
+
+
+class TracedJSONResponse(JSONResponse):
+    """
+    JSONResponse recording JSON encoding of the body as a span
+    """
+
+    def render(self, content: Any) -> bytes:
+        with tracer.span("response.serialize"):
+            return super().render(content)
+
+
+class TracingMiddleware:
+    """
+    Wrap every HTTP request in a root span
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with tracer.start_trace(
+            f"HTTP {scope['method']} {scope['path']}",
+            **{"http.method": scope["method"], "http.target": scope["path"]}
+        ) as root:
+            if root is None:
+                await self.app(scope, receive, send)
+                return
+
+            async def traced_send(message):
+                if message["type"] == "http.response.start":
+                    root.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        root.status = "ERROR"
+                await send(message)
+
+            await self.app(scope, receive, traced_send)
@@ -0,0 +1,430 @@
+"""
+Online migration of the task tables to the compact task schema
+
+Runs in two steps so old and new application instances can serve side by
+side during the rollout:
+
+1. Expand, `python -m app.db.migrations`, before deploying: adds
+   `priority_level` and `assignee_id` to `tasks` and `tasks_archive` on every
+   shard, fills them batch by batch from the legacy `priority` and
+   `assigned_to` strings, and creates the task indexes missing from the
+   table. It also drops the foreign key from `tasks.house_id` to `houses`,
+   which deleting a house before its tasks (and sharding) can't keep. The
+   legacy columns are left for the old instances, and triggers keep them
+   filled from the new columns for tasks the new instances write (assignee
+   names only where `users` shares the database with the tasks). It is
+   safe to run again.
+2. Contract, `python -m app.db.migrations --contract`, once no old instance
+   is left: converts the rows old instances inserted meanwhile, then drops
+   the triggers and the legacy columns.
+
+Rows still to convert are those with a NULL `priority_level`, which is also
+what old instances insert. Changes old instances make to rows that were
+already converted are not carried over. Legacy assignees that match no
+member of the task's house by email or name stay unassigned. They are
+logged as they are converted, and the contract step drops their strings.
+
+The expand step also flags the existing password hashes that may be of
+truncated passwords. On SQLite it rebuilds `houses` and `tasks` with
+AUTOINCREMENT, so that ids of deleted houses (whose tasks may still await
+the purge job) and of archived tasks are never handed out again.
+"""
+import argparse
+import logging
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+from sqlalchemy import (
+    Column, ForeignKeyConstraint, MetaData, PrimaryKeyConstraint, Table, UniqueConstraint,
+    bindparam, column, func, inspect, select, table, text, update
+)
+from sqlalchemy.engine import Engine
+from .. import models
+from ..models.task import TaskPriority
+from .session import engine
+from .shards import shard_router
+
+logger = logging.getLogger(__name__)
+
+TASK_TABLES = ["tasks", "tasks_archive"]
+
+LEGACY_COLUMNS = ["priority", "assigned_to"]
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def _legacy_table(name: str):
+    # The models no longer map the legacy columns
+    return table(
+        name, column("id"), column("house_id"), column("priority"), column("priority_level"),
+        column("assigned_to"), column("assignee_id")
+    )
+
+
+def _columns(shard_engine: Engine, table_name: str) -> set:
+    return {column["name"] for column in inspect(shard_engine).get_columns(table_name)}
+
+
+def add_columns(shard_engine: Engine, table_name: str) -> None:
+    columns = _columns(shard_engine, table_name)
+    with shard_engine.begin() as connection:
+        # Nullable without a default, so rows that old instances insert stay
+        # recognizable as unconverted; the contract step adds the default
+        if "priority_level" not in columns:
+            connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN priority_level SMALLINT"))
+        if "assignee_id" not in columns:
+            connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN assignee_id INTEGER"))
+
+
+def _house_members(house_ids: List[int]) -> Dict[int, Dict[str, int]]:
+    """
+    Map each house to {lowercased email or name: user id} for its members and creator
+    """
+    with engine.connect() as connection:
+        rows = connection.execute(
+            select(models.HouseMember.house_id, models.User.id, models.User.email, models.User.name).join(
+                models.User, models.User.id == models.HouseMember.user_id
+            ).where(
+                models.HouseMember.house_id.in_(house_ids)
+            ).union_all(
+                select(models.House.id, models.User.id, models.User.email, models.User.name).join(
+                    models.User, models.User.id == models.House.creator_id
+                ).where(models.House.id.in_(house_ids))
+            )
+        ).all()
+
+    members = defaultdict(dict)
+    # Lowest user id wins when several members share a name
+    for house_id, user_id, email, name in sorted(rows, key=lambda row: row[1], reverse=True):
+        members[house_id][email.lower()] = user_id
+        members[house_id][name.strip().lower()] = user_id
+    return members
+
+
+def _priority_level(priority) -> int:
+    # Unknown values become medium
+    try:
+        return int(TaskPriority.from_label(priority))
+    except (AttributeError, ValueError):
+        return int(TaskPriority.MEDIUM)
+
+
+def backfill(shard_engine: Engine, table_name: str, batch_size: int) -> Tuple[int, Counter]:
+    """
+    Convert the legacy strings of rows not converted yet. Returns the number
+    of rows converted and a count of the assignees that matched no house
+    member, by (house id, legacy string).
+    """
+    if not set(LEGACY_COLUMNS) <= _columns(shard_engine, table_name):
+        return 0, Counter()
+    tasks = _legacy_table(table_name)
+    converted = 0
+    unresolved = Counter()
+    last_id = 0
+    while True:
+        with shard_engine.begin() as connection:
+            rows = connection.execute(
+                select(tasks.c.id, tasks.c.house_id, tasks.c.priority, tasks.c.assigned_to).where(
+                    tasks.c.id > last_id, tasks.c.priority_level.is_(None)
+                ).order_by(tasks.c.id).limit(batch_size)
+            ).all()
+            if not rows:
+                return converted, unresolved
+            last_id = rows[-1].id
+
+            members = _house_members(list({row.house_id for row in rows if row.assigned_to}))
+            values = []
+            for row in rows:
+                assignee_id = None
+                if row.assigned_to:
+                    assignee_id = members.get(row.house_id, {}).get(row.assigned_to.strip().lower())
+                    if assignee_id is None:
+                        unresolved[(row.house_id, row.assigned_to)] += 1
+                values.append({
+                    "task_id": row.id,
+                    "level": _priority_level(row.priority),
+                    "user_id": assignee_id
+                })
+            connection.execute(
+                update(tasks).where(tasks.c.id == bindparam("task_id")).values(
+                    priority_level=bindparam("level"), assignee_id=bindparam("user_id")
+                ),
+                values
+            )
+        converted += len(rows)
+
+
+def create_indexes(shard_engine: Engine) -> None:
+    existing = {index["name"] for index in inspect(shard_engine).get_indexes("tasks")}
+    for index in models.Task.__table__.indexes:
+        if index.name in existing:
+            continue
+        if shard_engine.dialect.name == "postgresql":
+            # Build without blocking writes; needs to run outside a transaction
+            columns = ", ".join(column.name for column in index.columns)
+            with shard_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+                connection.execute(text(
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index.name} ON tasks ({columns})"
+                ))
+        else:
+            index.create(bind=shard_engine)
+
+
+def drop_house_foreign_keys(shard_engine: Engine, table_name: str) -> None:
+    """
+    Drop the foreign keys from `house_id` to `houses` the tables were created with
+    """
+    if shard_engine.dialect.name == "sqlite":
+        # Dropped by the rebuild of tasks; SQLite can't drop them otherwise
+        return
+    for foreign_key in inspect(shard_engine).get_foreign_keys(table_name):
+        if foreign_key["referred_table"] == "houses" and foreign_key["name"]:
+            with shard_engine.begin() as connection:
+                connection.execute(text(f"ALTER TABLE {table_name} DROP CONSTRAINT {foreign_key['name']}"))
+
+
+LEGACY_TRIGGER = "tasks_legacy_columns"
+
+
+def add_legacy_triggers(shard_engine: Engine) -> None:
+    """
+    Fill the legacy `priority` and `assigned_to` of tasks from the new columns
+    when new instances write them, so old instances keep showing them.
+    Rows old instances write (a NULL `priority_level`) are left alone, and so
+    is the conversion of those rows by `backfill`.
+    """
+    if not set(LEGACY_COLUMNS) <= _columns(shard_engine, "tasks"):
+        return
+    priority = "CASE NEW.priority_level " + " ".join(
+        f"WHEN {int(level)} THEN '{level.label}'" for level in TaskPriority
+    ) + " END"
+    assigned_to = "NULL"
+    if inspect(shard_engine).has_table("users"):
+        assigned_to = "(SELECT name FROM users WHERE id = NEW.assignee_id)"
+
+    with shard_engine.begin() as connection:
+        if shard_engine.dialect.name == "postgresql":
+            connection.execute(text(f"""
+                CREATE OR REPLACE FUNCTION {LEGACY_TRIGGER}() RETURNS trigger AS $$
+                BEGIN
+                    IF NEW.priority_level IS NOT NULL AND (TG_OP = 'INSERT' OR OLD.priority_level IS NOT NULL) THEN
+                        NEW.priority := {priority};
+                        NEW.assigned_to := {assigned_to};
+                    END IF;
+                    RETURN NEW;
+                END
+                $$ LANGUAGE plpgsql
+            """))
+            connection.execute(text(f"DROP TRIGGER IF EXISTS {LEGACY_TRIGGER} ON tasks"))
+            connection.execute(text(
+                f"CREATE TRIGGER {LEGACY_TRIGGER} BEFORE INSERT OR UPDATE OF priority_level, assignee_id "
+                f"ON tasks FOR EACH ROW EXECUTE FUNCTION {LEGACY_TRIGGER}()"
+            ))
+        else:
+            fill = f"UPDATE tasks SET priority = {priority}, assigned_to = {assigned_to} WHERE id = NEW.id;"
+            connection.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {LEGACY_TRIGGER}_insert AFTER INSERT ON tasks "
+                f"WHEN NEW.priority_level IS NOT NULL BEGIN {fill} END"
+            ))
+            connection.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {LEGACY_TRIGGER}_update "
+                f"AFTER UPDATE OF priority_level, assignee_id ON tasks "
+                f"WHEN OLD.priority_level IS NOT NULL BEGIN {fill} END"
+            ))
+
+
+def drop_legacy_triggers(shard_engine: Engine) -> None:
+    with shard_engine.begin() as connection:
+        if shard_engine.dialect.name == "postgresql":
+            connection.execute(text(f"DROP TRIGGER IF EXISTS {LEGACY_TRIGGER} ON tasks"))
+            connection.execute(text(f"DROP FUNCTION IF EXISTS {LEGACY_TRIGGER}()"))
+        else:
+            connection.execute(text(f"DROP TRIGGER IF EXISTS {LEGACY_TRIGGER}_insert"))
+            connection.execute(text(f"DROP TRIGGER IF EXISTS {LEGACY_TRIGGER}_update"))
+
+
+def drop_legacy_columns(shard_engine: Engine, table_name: str) -> None:
+    columns = _columns(shard_engine, table_name)
+    if table_name == "tasks":
+        # SQLite refuses to drop columns that triggers use
+        drop_legacy_triggers(shard_engine)
+    with shard_engine.begin() as connection:
+        if shard_engine.dialect.name == "postgresql":
+            # SQLite can't alter columns; the application always writes priority_level
+            connection.execute(text(
+                f"ALTER TABLE {table_name} ALTER COLUMN priority_level "
+                f"SET DEFAULT {int(TaskPriority.MEDIUM)}"
+            ))
+            connection.execute(text(f"ALTER TABLE {table_name} ALTER COLUMN priority_level SET NOT NULL"))
+        for legacy_column in LEGACY_COLUMNS:
+            if legacy_column in columns:
+                connection.execute(text(f"ALTER TABLE {table_name} DROP COLUMN {legacy_column}"))
+
+
+def _has_autoincrement(shard_engine: Engine, table_name: str) -> bool:
+    with shard_engine.connect() as connection:
+        sql = connection.scalar(
+            text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table_name}
+        )
+    return "AUTOINCREMENT" in sql.upper()
+
+
+def _max_id(shard_engine: Engine, table_name: str, column_name: str) -> int:
+    if not inspect(shard_engine).has_table(table_name):
+        return 0
+    with shard_engine.connect() as connection:
+        return connection.scalar(select(func.max(column(column_name))).select_from(table(table_name))) or 0
+
+
+def rebuild_with_autoincrement(
+    shard_engine: Engine, table_name: str, next_id: int, skip_foreign_keys_to: Tuple[str, ...] = ()
+) -> bool:
+    """
+    Rebuild a SQLite table with AUTOINCREMENT on its id, keeping its columns,
+    rows and indexes, so ids from `next_id` on are handed out. Returns False
+    when there was nothing to do.
+    """
+    if shard_engine.dialect.name != "sqlite" or _has_autoincrement(shard_engine, table_name):
+        return False
+    inspector = inspect(shard_engine)
+    columns = inspector.get_columns(table_name)
+    foreign_keys = [
+        foreign_key for foreign_key in inspector.get_foreign_keys(table_name)
+        if foreign_key["referred_table"] not in skip_foreign_keys_to
+        and inspector.has_table(foreign_key["referred_table"])
+    ]
+    metadata = MetaData()
+    metadata.reflect(shard_engine, only=list({foreign_key["referred_table"] for foreign_key in foreign_keys}))
+    rebuilt_name = f"{table_name}_rebuilt"
+    rebuilt = Table(
+        rebuilt_name, metadata,
+        *[
+            Column(
+                info["name"], info["type"], nullable=info["nullable"],
+                server_default=text(f"({info['default']})") if info["default"] is not None else None
+            )
+            for info in columns
+        ],
+        PrimaryKeyConstraint(*inspector.get_pk_constraint(table_name)["constrained_columns"]),
+        *[
+            UniqueConstraint(*constraint["column_names"])
+            for constraint in inspector.get_unique_constraints(table_name)
+        ],
+        *[
+            ForeignKeyConstraint(
+                foreign_key["constrained_columns"],
+                [f"{foreign_key['referred_table']}.{name}" for name in foreign_key["referred_columns"]]
+            )
+            for foreign_key in foreign_keys
+        ],
+        sqlite_autoincrement=True
+    )
+    indexes = [index for index in inspector.get_indexes(table_name) if not index["name"].startswith("sqlite_")]
+    names = ", ".join(info["name"] for info in columns)
+
+    # SQLite's procedure for schema changes it can't ALTER: copy into a new
+    # table, drop the old one, rename; foreign keys aren't enforced meanwhile
+    # since the application never enables PRAGMA foreign_keys
+    with shard_engine.begin() as connection:
+        rebuilt.create(connection)
+        connection.execute(text(f"INSERT INTO {rebuilt_name} ({names}) SELECT {names} FROM {table_name}"))
+        connection.execute(text(f"DROP TABLE {table_name}"))
+        connection.execute(text(f"ALTER TABLE {rebuilt_name} RENAME TO {table_name}"))
+        for index in indexes:
+            connection.execute(text(
+                f"CREATE {'UNIQUE ' if index['unique'] else ''}INDEX {index['name']} "
+                f"ON {table_name} ({', '.join(index['column_names'])})"
+            ))
+        connection.execute(text("DELETE FROM sqlite_sequence WHERE name = :name"), {"name": table_name})
+        connection.execute(
+            text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"),
+            {"name": table_name, "seq": next_id - 1}
+        )
+    logger.info("Rebuilt %s with AUTOINCREMENT, next id %d", table_name, next_id)
+    return True
+
+
+def add_house_autoincrement(directory_engine: Engine) -> None:
+    """
+    Rebuild `houses` with AUTOINCREMENT on SQLite, past every house id that
+    tasks or archived tasks on any shard still refer to
+    """
+    if not inspect(directory_engine).has_table("houses"):
+        return
+    last_id = max(
+        [_max_id(directory_engine, "houses", "id")] +
+        [
+            _max_id(shard_engine, table_name, "house_id")
+            for shard_engine in shard_router.engines for table_name in TASK_TABLES
+        ]
+    )
+    rebuild_with_autoincrement(directory_engine, "houses", last_id + 1)
+
+
+def add_password_truncated(directory_engine: Engine) -> None:
+    """
+    Add `users.password_truncated`, set for every hash stored so far
+    """
+    if not inspect(directory_engine).has_table("users"):
+        return
+    columns = {column["name"] for column in inspect(directory_engine).get_columns("users")}
+    if "password_truncated" not in columns:
+        with directory_engine.begin() as connection:
+            # The default also flags rows old instances insert during the rollout
+            connection.execute(text(
+                "ALTER TABLE users ADD COLUMN password_truncated BOOLEAN NOT NULL DEFAULT TRUE"
+            ))
+
+
+def migrate_task_schema(batch_size: int = DEFAULT_BATCH_SIZE, contract: bool = False) -> Counter:
+    """
+    Run the expand step, or the contract step with `contract`. Returns the
+    unresolved legacy assignees by (house id, legacy string).
+    """
+    unresolved = Counter()
+    for shard, shard_engine in enumerate(shard_router.engines):
+        for table_name in TASK_TABLES:
+            if not inspect(shard_engine).has_table(table_name):
+                logger.warning("Shard %d has no %s table, skipping it (run init_db.py)", shard, table_name)
+                continue
+            if table_name == "tasks":
+                # Archived tasks keep their ids, so those mustn't come back either
+                last_id = max(_max_id(shard_engine, name, "id") for name in TASK_TABLES)
+                rebuild_with_autoincrement(
+                    shard_engine, table_name, last_id + 1, skip_foreign_keys_to=("houses",)
+                )
+            add_columns(shard_engine, table_name)
+            drop_house_foreign_keys(shard_engine, table_name)
+            converted, table_unresolved = backfill(shard_engine, table_name, batch_size)
+            unresolved += table_unresolved
+            logger.info(
+                "Shard %d %s: converted %d tasks, %d with an unresolved assignee",
+                shard, table_name, converted, sum(table_unresolved.values())
+            )
+            if contract:
+                drop_legacy_columns(shard_engine, table_name)
+        if inspect(shard_engine).has_table("tasks"):
+            create_indexes(shard_engine)
+            if not contract:
+                add_legacy_triggers(shard_engine)
+
+    for (house_id, assigned_to), count in sorted(unresolved.items()):
+        logger.warning(
+            "House %d: %d task(s) assigned to %r, which matches no member; left unassigned",
+            house_id, count, assigned_to
+        )
+    return unresolved
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate the task tables to the compact task schema")
+    parser.add_argument(
+        "--contract", action="store_true",
+        help="drop the legacy columns; run once no old application instance is left"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if not args.contract:
+        add_password_truncated(engine)
+        add_house_autoincrement(engine)
+    migrate_task_schema(contract=args.contract)
+    print("Legacy task columns dropped" if args.contract else "Task schema migrated")
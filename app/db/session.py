@@ -1,9 +1,24 @@
+from typing import Any, Dict
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from ..core.config import settings
+from ..core.tracing import instrument_engine
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def engine_options(url: str) -> Dict[str, Any]:
+    options = {"pool_pre_ping": True}
+    if make_url(url).get_driver_name() == "psycopg":
+        # Prepare repeated statements (e.g. those in db.statements) server-side
+        options["connect_args"] = {"prepare_threshold": settings.DATABASE_PREPARE_THRESHOLD}
+    return options
+
+engine = create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL))
+instrument_engine(engine)
+# Write paths use INSERT/UPDATE ... RETURNING, so objects already hold their
+# committed state and don't need to be expired and re-selected after commit
+SessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, expire_on_commit=False, bind=engine
+)
 
 Base = declarative_base()
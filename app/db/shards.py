@@ -0,0 +1,142 @@
+"""
+Routing of house-scoped data (tasks and archived tasks) across shard databases
+
+Users, houses and memberships live in the directory database
+(`DATABASE_URL`). Tasks of a house live on shard `house_id % N`, where the
+shards are listed in `SHARD_DATABASE_URLS`. Without shards, the directory
+database is the only shard and everything shares one session.
+
+Task ids are only unique per shard, so the API exposes
+`local_id * N + shard`; with a single shard this is the plain row id.
+"""
+import asyncio
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Tuple, TypeVar
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+from ..core.config import settings
+from ..core.tracing import instrument_engine
+from .session import engine, engine_options, SessionLocal
+
+T = TypeVar("T")
+
+# Tables stored on the shards; everything else lives in the directory.
+# applied_jobs sits next to the tasks that job handlers write.
+SHARDED_TABLES = ["tasks", "tasks_archive", "applied_jobs"]
+
+
+class ShardRouter:
+    def __init__(self, urls: List[str]):
+        if urls:
+            self.engines = [create_engine(url, **engine_options(url)) for url in urls]
+            for shard_engine in self.engines:
+                instrument_engine(shard_engine)
+            self.sessionmakers = [
+                sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=shard_engine)
+                for shard_engine in self.engines
+            ]
+        else:
+            self.engines = [engine]
+            self.sessionmakers = [SessionLocal]
+
+    @property
+    def count(self) -> int:
+        return len(self.engines)
+
+    @property
+    def uses_directory(self) -> bool:
+        """
+        True when the only shard is the directory database itself
+        """
+        return self.engines == [engine]
+
+    def shard_for_house(self, house_id: int) -> int:
+        return house_id % self.count
+
+    def public_task_id(self, local_id: int, house_id: int) -> int:
+        return local_id * self.count + self.shard_for_house(house_id)
+
+    def split_task_id(self, task_id: int) -> Tuple[int, int]:
+        """
+        Split a public task id into (shard, local id)
+        """
+        local_id, shard = divmod(task_id, self.count)
+        return shard, local_id
+
+    def group_houses(self, house_ids: Iterable[int]) -> Dict[int, List[int]]:
+        by_shard = defaultdict(list)
+        for house_id in house_ids:
+            by_shard[self.shard_for_house(house_id)].append(house_id)
+        return dict(by_shard)
+
+    def group_tasks(self, task_ids: Iterable[int]) -> Dict[int, List[int]]:
+        by_shard = defaultdict(list)
+        for task_id in task_ids:
+            shard, local_id = self.split_task_id(task_id)
+            by_shard[shard].append(local_id)
+        return dict(by_shard)
+
+
+shard_router = ShardRouter(
+    [url.strip() for url in settings.SHARD_DATABASE_URLS.split(",") if url.strip()]
+)
+
+
+class ShardSessions:
+    """
+    Per-request sessions, opened lazily for the shards a request touches
+    """
+
+    def __init__(self, db: Session, router: ShardRouter = shard_router):
+        self.db = db
+        self.router = router
+        self._sessions: Dict[int, Session] = {}
+
+    def for_shard(self, shard: int) -> Session:
+        if self.router.uses_directory:
+            return self.db
+        if shard not in self._sessions:
+            self._sessions[shard] = self.router.sessionmakers[shard]()
+        return self._sessions[shard]
+
+    def for_house(self, house_id: int) -> Session:
+        return self.for_shard(self.router.shard_for_house(house_id))
+
+    def commit(self) -> None:
+        """
+        Commit shard sessions, then the directory session (change log etc.)
+        """
+        for session in self._sessions.values():
+            session.commit()
+        self.db.commit()
+
+    def rollback(self) -> None:
+        for session in self._sessions.values():
+            session.rollback()
+        self.db.rollback()
+
+    def close(self) -> None:
+        for session in self._sessions.values():
+            session.close()
+        self._sessions.clear()
+
+    async def fan_out(
+        self, groups: Dict[int, List[int]], query: Callable[[Session, List[int]], List[T]]
+    ) -> List[T]:
+        """
+        Run `query(session, ids)` for every shard in `groups` concurrently and
+        concatenate the results
+        """
+        if not groups:
+            return []
+        if len(groups) == 1:
+            shard, ids = next(iter(groups.items()))
+            return list(query(self.for_shard(shard), ids))
+
+        results = await asyncio.gather(*[
+            run_in_threadpool(query, self.for_shard(shard), ids)
+            for shard, ids in groups.items()
+        ])
+        return [row for rows in results for row in rows]
+
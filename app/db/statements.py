@@ -0,0 +1,46 @@
+"""
+Statements for the lookups that run on (nearly) every request
+
+Each is a `lambda_stmt`: SQLAlchemy builds the statement and its cache key
+once per call site and afterwards only extracts the closure variables as
+bound parameters, instead of constructing and traversing a new ORM query
+for every request. The SQL text is identical between calls, so the psycopg
+driver can also prepare it server-side (see `DATABASE_PREPARE_THRESHOLD`).
+
+Execute with `db.execute(...)` / `db.scalars(...)` on a directory session.
+"""
+from sqlalchemy import exists, lambda_stmt, select
+from sqlalchemy.sql import StatementLambdaElement
+from .. import models
+
+
+def user_by_id(user_id: int) -> StatementLambdaElement:
+    return lambda_stmt(lambda: select(models.User).where(models.User.id == user_id))
+
+
+def user_by_email(email: str) -> StatementLambdaElement:
+    return lambda_stmt(lambda: select(models.User).where(models.User.email == email))
+
+
+def house_with_membership(house_id: int, user_id: int) -> StatementLambdaElement:
+    """
+    Rows of (house, whether the user is a member) in one round trip
+    """
+    return lambda_stmt(lambda: select(
+        models.House,
+        exists().where(
+            models.HouseMember.house_id == models.House.id,
+            models.HouseMember.user_id == user_id
+        ).label("is_member")
+    ).where(models.House.id == house_id))
+
+
+def user_house_ids(user_id: int) -> StatementLambdaElement:
+    """
+    Ids of the houses the user created or is a member of
+    """
+    return lambda_stmt(lambda: select(models.House.id).where(
+        (models.House.creator_id == user_id) | models.House.id.in_(
+            select(models.HouseMember.house_id).where(models.HouseMember.user_id == user_id)
+        )
+    ))
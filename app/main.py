@@ -1,17 +1,36 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from .api.api_v1.api import api_router
-from .api.api_v1.endpoints import auth, houses, tasks
+from .api.api_v1.endpoints import auth, dashboard, houses, jobs, tasks, sync
 from .core.config import settings
+from .core.events import event_bus
+from .core.idempotency import IdempotencyMiddleware
+from .core.limiter import ConcurrencyLimitMiddleware, limits
+from .core.tracing import TracedJSONResponse, TracingMiddleware
 
 app = FastAPI(
     title="Flatmate API",
     description="Backend API for Flatmate shared task management app",
     version="1.0.0",
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    default_response_class=TracedJSONResponse
 )
 
+# Replay responses for retried writes carrying an Idempotency-Key header
+# (added before CORS so CORS headers wrap replayed responses too)
+IDEMPOTENT_PATHS = ["/tasks/create", "/houses/create", "/houses/invite"]
+app.add_middleware(
+    IdempotencyMiddleware,
+    paths=IDEMPOTENT_PATHS + [f"{settings.API_V1_STR}{path}" for path in IDEMPOTENT_PATHS]
+)
+
+# Shed load with fast 503s once a route class is over its adaptive limit
+# (inside CORS, so browsers can read the 503)
+if settings.CONCURRENCY_LIMIT_ENABLED:
+    app.add_middleware(ConcurrencyLimitMiddleware, exempt_paths=["/", "/health", "/metrics"])
+
 # Set up CORS
 if settings.BACKEND_CORS_ORIGINS:
     app.add_middleware(
@@ -22,14 +41,26 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_headers=["*"],
     )
 
+# Trace requests (added last so the root span covers the other middleware)
+if settings.TRACING_ENABLED:
+    app.add_middleware(TracingMiddleware)
+
 # Include routers at root level (for frontend compatibility)
 app.include_router(auth.router, prefix="/auth", tags=["authentication"])
 app.include_router(houses.router, prefix="/houses", tags=["houses"])
 app.include_router(tasks.router, prefix="/tasks", tags=["tasks"])
+app.include_router(dashboard.router, prefix="/dashboard", tags=["dashboard"])
+app.include_router(sync.router, prefix="/sync", tags=["sync"])
+app.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
 
 # Include full API router
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+@app.on_event("startup")
+async def start_background_tasks():
+    # Keep a reference so the task isn't garbage collected
+    app.state.event_bus_task = asyncio.create_task(event_bus.run())
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to Flatmate API"}
@@ -37,3 +68,11 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+@app.get("/metrics")
+async def metrics():
+    return {
+        "concurrency_limits": {
+            route_class: limit.snapshot() for route_class, limit in limits.items()
+        }
+    }
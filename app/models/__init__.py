@@ -2,6 +2,11 @@
 from .user import User
 from .house import House
 from .house_member import HouseMember
-from .task import Task
+from .task import Task, TaskPriority
+from .archived_task import ArchivedTask
+from .idempotency_key import IdempotencyKey
+from .change_log import ChangeLog
+from .job import AppliedJob, Job, PeriodicRun
+from .invalidation_event import InvalidationEvent
 
-__all__ = ["User", "House", "HouseMember", "Task"]
+__all__ = ["User", "House", "HouseMember", "Task", "TaskPriority", "ArchivedTask", "IdempotencyKey", "ChangeLog", "Job", "AppliedJob", "PeriodicRun", "InvalidationEvent"]
@@ -0,0 +1,26 @@
+from sqlalchemy import Boolean, Column, Integer, SmallInteger, String, DateTime, Index, func
+from ..db.session import Base
+
+
+class ArchivedTask(Base):
+    """
+    Cold copy of a completed task, moved out of `tasks` by the archiver
+    """
+    __tablename__ = "tasks_archive"
+
+    id = Column(Integer, primary_key=True)  # Same id the task had in `tasks`
+    title = Column(String, nullable=False)
+    description = Column(String, nullable=True)
+    house_id = Column(Integer, nullable=False)
+    assignee_id = Column(Integer, nullable=True)
+    deadline = Column(DateTime(timezone=True), nullable=True)
+    priority_level = Column(SmallInteger, nullable=False)  # TaskPriority
+    completed = Column(Boolean, default=True)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_tasks_archive_house_id", "house_id", "id"),
+    )
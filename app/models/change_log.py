@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index, func
+from ..db.session import Base
+
+
+class ChangeLog(Base):
+    """
+    Append-only log of task/house changes; the id is the sync cursor
+    """
+    __tablename__ = "change_log"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    entity = Column(String(16), nullable=False)  # task, house or log (compaction marker)
+    entity_id = Column(Integer, nullable=False)
+    op = Column(String(16), nullable=False)  # upsert, delete or compact
+    house_id = Column(Integer, nullable=True)
+    user_id = Column(Integer, nullable=True)  # Set when only this user should see the change
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_change_log_house_id", "house_id", "id"),
+        Index("ix_change_log_user_id", "user_id", "id"),
+        {"sqlite_autoincrement": True},  # Never reuse ids, they are client cursors
+    )
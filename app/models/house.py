@@ -16,4 +16,10 @@ class House(Base):
     # Relationships
     creator = relationship("User", back_populates="houses_created")
     members = relationship("HouseMember", back_populates="house")
-    tasks = relationship("Task", back_populates="house")
+    # Tasks may live on another shard, so there is no House.tasks relationship
+
+    __table_args__ = (
+        # Tasks of a deleted house are purged later, so a new house must never
+        # get its id
+        {"sqlite_autoincrement": True},
+    )
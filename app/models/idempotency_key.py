@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String, Text, LargeBinary, DateTime, func
+from ..db.session import Base
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(64), primary_key=True)  # sha256 of credentials + Idempotency-Key
+    fingerprint = Column(String(64), nullable=False)  # sha256 of method, path, query and body
+    status_code = Column(Integer, nullable=True)  # NULL while the first request is in flight
+    headers = Column(Text, nullable=True)  # JSON list of [name, value] pairs
+    body = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
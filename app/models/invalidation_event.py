@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, Text, DateTime, func
+from ..db.session import Base
+
+
+class InvalidationEvent(Base):
+    """
+    Cache invalidation broadcast between workers by the "database" event bus
+    """
+    __tablename__ = "invalidation_events"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    payload = Column(Text, nullable=False)  # JSON event
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+    __table_args__ = (
+        {"sqlite_autoincrement": True},  # Pollers track the last id they have seen
+    )
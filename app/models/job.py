@@ -0,0 +1,49 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index, func
+from ..db.session import Base
+
+
+class Job(Base):
+    """
+    Background job picked up by `python -m app.worker`
+    """
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(50), nullable=False)
+    payload = Column(Text, nullable=False)  # JSON arguments for the handler
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, succeeded, failed
+    user_id = Column(Integer, nullable=True, index=True)  # Owner allowed to poll the job
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    result = Column(Text, nullable=True)  # JSON returned by the handler
+    error = Column(Text, nullable=True)
+    run_after = Column(DateTime, nullable=False)  # Earliest start, pushed back on retries
+    locked_until = Column(DateTime, nullable=True)  # Visibility timeout of a running job
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_jobs_status_run_after", "status", "run_after"),
+    )
+
+
+class AppliedJob(Base):
+    """
+    Marks a job whose work is committed, written in the same transaction as
+    that work so a retried attempt can tell it already ran
+    """
+    __tablename__ = "applied_jobs"
+
+    job_id = Column(Integer, primary_key=True, autoincrement=False)
+    applied_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class PeriodicRun(Base):
+    """
+    When a periodic task registered with `jobs.periodic_task` is next due;
+    the worker that moves it forward runs that occurrence
+    """
+    __tablename__ = "periodic_runs"
+
+    name = Column(String(50), primary_key=True)
+    next_run_at = Column(DateTime, nullable=False)
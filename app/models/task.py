@@ -1,22 +1,52 @@
-from sqlalchemy import Boolean, Column, Integer, String, DateTime, func, ForeignKey
-from sqlalchemy.orm import relationship
+import enum
+from sqlalchemy import Boolean, Column, Integer, SmallInteger, String, DateTime, Index, func
 from ..db.session import Base
 
 
+class TaskPriority(enum.IntEnum):
+    LOW = 1
+    MEDIUM = 2
+    HIGH = 3
+
+    @property
+    def label(self) -> str:
+        return self.name.lower()
+
+    @classmethod
+    def from_label(cls, label: str) -> "TaskPriority":
+        """
+        Parse the API's "low"/"medium"/"high"; raises ValueError otherwise
+        """
+        try:
+            return cls[label.strip().upper()]
+        except KeyError:
+            raise ValueError(f"Invalid priority {label!r}")
+
+
 class Task(Base):
     __tablename__ = "tasks"
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
     description = Column(String, nullable=True)
-    house_id = Column(Integer, ForeignKey("houses.id"), nullable=False)
-    assigned_to = Column(String, nullable=True)  # Can be user name or email
+    # No foreign key: tasks may live on a different shard than their house
+    house_id = Column(Integer, nullable=False, index=True)
+    # users.id of a house member; no foreign key for the same reason
+    assignee_id = Column(Integer, nullable=True)
     deadline = Column(DateTime(timezone=True), nullable=True)
-    priority = Column(String, default="medium")  # low, medium, high
+    priority_level = Column(
+        SmallInteger, nullable=False, default=TaskPriority.MEDIUM,
+        server_default=str(int(TaskPriority.MEDIUM))
+    )  # TaskPriority
     completed = Column(Boolean, default=False)
     completed_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
-    # Relationships
-    house = relationship("House", back_populates="tasks")
+    __table_args__ = (
+        Index("ix_tasks_assignee_id_completed", "assignee_id", "completed"),
+        Index("ix_tasks_house_id_priority_level_completed", "house_id", "priority_level", "completed"),
+        Index("ix_tasks_house_id_deadline", "house_id", "deadline"),
+        # Archived tasks keep their id in tasks_archive, so ids must not come back
+        {"sqlite_autoincrement": True},
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String, DateTime, func
+from sqlalchemy import Boolean, Column, Integer, String, DateTime, func, true
 from sqlalchemy.orm import relationship
 from ..db.session import Base
 
@@ -11,6 +11,10 @@ class User(Base):
     email = Column(String, unique=True, index=True, nullable=False)
     phone = Column(String, nullable=True)
     password_hash = Column(String, nullable=False)
+    # The hash may be of the password cut to 50 characters, as stored before
+    # passwords were hashed in full. The server default flags rows inserted by
+    # old instances during an upgrade; this code always writes False.
+    password_truncated = Column(Boolean, nullable=False, default=False, server_default=true())
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -0,0 +1,114 @@
+"""
+Background job worker
+
+Run with `python -m app.worker`. Claims jobs from the `jobs` table and runs
+them on a thread or process pool (`JOB_WORKER_POOL`), at most
+`JOB_WORKER_CONCURRENCY` at a time and within the per-kind limits of
+`JOB_KIND_CONCURRENCY`. Several workers can share one database.
+
+The periodic maintenance registered with `jobs.periodic_task` (task
+archival, change log compaction) runs on the same pool; of all the
+workers, the one claiming an occurrence runs it.
+"""
+import logging
+import signal
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Dict, Tuple
+from .api.api_v1 import api  # noqa: F401  (registers the job handlers of the endpoints)
+from .core import archiver, changelog, jobs  # noqa: F401  (register their periodic tasks)
+from .core.config import settings
+from .db.session import SessionLocal, engine
+from .db.shards import shard_router
+
+logger = logging.getLogger(__name__)
+
+
+def _init_process() -> None:
+    # Connections inherited through fork belong to the parent
+    engine.dispose(close=False)
+    for shard_engine in shard_router.engines:
+        shard_engine.dispose(close=False)
+
+
+class Worker:
+    def __init__(
+        self,
+        concurrency: int = settings.JOB_WORKER_CONCURRENCY,
+        pool: str = settings.JOB_WORKER_POOL,
+        kind_limits: Dict[str, int] = None
+    ):
+        self.concurrency = concurrency
+        self.pool = pool
+        self.kind_limits = settings.JOB_KIND_LIMITS if kind_limits is None else kind_limits
+        self.stopping = False
+
+    def _executor(self) -> Executor:
+        if self.pool == "process":
+            return ProcessPoolExecutor(self.concurrency, initializer=_init_process)
+        return ThreadPoolExecutor(self.concurrency, thread_name_prefix="job")
+
+    def stop(self, *_) -> None:
+        logger.info("Stopping after running jobs finish")
+        self.stopping = True
+
+    def run(self) -> None:
+        running: Dict[Future, Tuple[str, int, int]] = {}  # future -> (kind, job id, attempt)
+        periodic: Dict[str, Future] = {}  # name -> running periodic task
+        periodic_check_every = min([60.0, *jobs.periodic_tasks().values()])
+        last_periodic_check = float("-inf")
+        renew_every = settings.JOB_VISIBILITY_TIMEOUT_SECONDS / 3
+        last_renewal = time.monotonic()
+        db = SessionLocal()
+        executor = self._executor()
+        logger.info("Worker running %s kinds: %s", self.pool, ", ".join(jobs.registered_kinds()))
+        try:
+            while not self.stopping:
+                for future in [future for future in running if future.done()]:
+                    kind, job_id, _ = running.pop(future)
+                    if future.exception():
+                        logger.error("Job %d (%s) crashed", job_id, kind, exc_info=future.exception())
+
+                # Fill free slots with jobs of kinds still under their limit
+                while len(running) < self.concurrency and not self.stopping:
+                    busy = Counter(kind for kind, _, _ in running.values())
+                    kinds = [
+                        kind for kind in jobs.registered_kinds()
+                        if busy[kind] < self.kind_limits.get(kind, self.concurrency)
+                    ]
+                    job = jobs.claim_job(db, kinds)
+                    if job is None:
+                        break
+                    future = executor.submit(jobs.run_job, job.id, job.attempts)
+                    running[future] = (job.kind, job.id, job.attempts)
+
+                # Start the periodic tasks that are due and not still running here
+                if time.monotonic() - last_periodic_check > periodic_check_every:
+                    for name, interval in jobs.periodic_tasks().items():
+                        if name in periodic and not periodic[name].done():
+                            continue
+                        if jobs.claim_periodic(db, name, interval):
+                            periodic[name] = executor.submit(jobs.run_periodic, name)
+                    last_periodic_check = time.monotonic()
+
+                # Keep long-running jobs from being claimed by other workers
+                if running and time.monotonic() - last_renewal > renew_every:
+                    jobs.renew_claims(db, [(job_id, attempt) for _, job_id, attempt in running.values()])
+                    last_renewal = time.monotonic()
+
+                if running:
+                    wait(running, timeout=settings.JOB_POLL_INTERVAL_SECONDS, return_when=FIRST_COMPLETED)
+                else:
+                    time.sleep(settings.JOB_POLL_INTERVAL_SECONDS)
+        finally:
+            executor.shutdown(wait=True)
+            db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    worker = Worker()
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
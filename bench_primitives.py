@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the primitives every request pays for: access token
+creation and decoding, password hashing and verification at the configured
+cost, task serialization, JSON encoding of a task list, and the per-request
+directory lookups as ORM queries next to the cached statements the API runs.
+
+    python bench_primitives.py               # run and compare with the baseline
+    python bench_primitives.py --save        # run and record a new baseline
+    python bench_primitives.py --repeat 40   # more runs, less noise
+
+Each primitive is timed relative to a fixed pure-Python reference loop
+measured in alternation with it, which cancels out the overall speed of the
+machine and drift during the run. It doesn't cancel out how differently
+CPUs run C code (hashlib, json, the sqlite3 driver), so the primitives that
+spend their time there are allowed a larger slowdown; see GATED. Record a
+new baseline with --save when CI moves to other hardware, or when a change
+is meant to make a primitive slower.
+
+Exits with status 1 when a gated primitive's ratio grew past its threshold,
+or when there is no baseline, so CI can flag the regression. Alternative JWT
+(PyJWT) and JSON (orjson, ujson) backends are timed next to the ones in use
+when they are installed, for information only: they are neither saved in
+the baseline nor gated.
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+
+from app import models
+from app.api.api_v1.endpoints.tasks import serialize_task
+from app.core import auth
+from app.core.config import settings
+from app.core.tracing import TracedJSONResponse
+from app.db import statements
+from app.db.session import Base
+
+BASELINE_FILE = "bench_baseline.json"
+
+PASSWORD = "correct horse battery staple"
+TASK_COUNT = 50
+
+# Primitives checked against the baseline, with the slowdown allowed for each
+GATED = {
+    "jwt.encode (python-jose)": 0.3,
+    "jwt.decode (python-jose)": 0.3,
+    "password.hash": 0.5,
+    "password.verify": 0.5,
+    f"task.serialize x{TASK_COUNT}": 0.25,
+    f"json.render x{TASK_COUNT} (stdlib)": 0.4,
+    "query.user_by_id (orm)": 0.3,
+    "query.user_by_id (statement)": 0.3,
+    "query.user_by_email (orm)": 0.3,
+    "query.user_by_email (statement)": 0.3,
+    "query.member_house (orm)": 0.3,
+    "query.member_house (statement)": 0.3,
+}
+
+# Target length of one timed run; many short runs give a steadier minimum
+# than a few long ones on a busy machine
+RUN_SECONDS = 0.05
+
+
+def make_tasks():
+    """Fixed task rows, as the API builds them from the database"""
+    created_at = datetime(2024, 1, 1, 12, 0, 0)
+    return [
+        models.Task(
+            id=task_id,
+            title=f"Task {task_id}",
+            description="Take out the recycling and the compost",
+            house_id=7,
+            assignee_id=3 if task_id % 2 else None,
+            deadline=created_at + timedelta(days=task_id),
+            priority_level=models.TaskPriority.MEDIUM,
+            completed=task_id % 3 == 0,
+            completed_at=created_at if task_id % 3 == 0 else None,
+            created_at=created_at
+        )
+        for task_id in range(1, TASK_COUNT + 1)
+    ]
+
+
+def make_directory_session():
+    """In-memory directory with a user who created one house and joined another"""
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    db = Session(engine)
+    db.add_all([
+        models.User(id=1, name="Alex", email="alex@example.com", password_hash="x"),
+        models.User(id=2, name="Sam", email="sam@example.com", password_hash="x"),
+        models.House(id=7, name="Home", creator_id=2),
+        models.House(id=8, name="Cabin", creator_id=1),
+        models.HouseMember(house_id=7, user_id=1)
+    ])
+    db.commit()
+    return db
+
+
+def orm_member_house(db, house_id, user_id):
+    """The house and membership lookups as separate ORM queries"""
+    house = db.query(models.House).filter(models.House.id == house_id).first()
+    is_member = db.query(models.HouseMember).filter(
+        models.HouseMember.house_id == house_id,
+        models.HouseMember.user_id == user_id
+    ).first()
+    return house, is_member
+
+
+def primitives():
+    """Name -> zero-argument callable for every benchmarked primitive"""
+    token = auth.create_access_token(42)
+    password_hash = auth.get_password_hash(PASSWORD)
+    tasks = make_tasks()
+    assignee_names = {3: "Alex"}
+    payload = [serialize_task(task, assignee_names) for task in tasks]
+    response = TracedJSONResponse(content=None)
+
+    benchmarks = {
+        "jwt.encode (python-jose)": lambda: auth.create_access_token(42),
+        "jwt.decode (python-jose)": lambda: auth.decode_access_token(token),
+        "password.hash": lambda: auth.get_password_hash(PASSWORD),
+        "password.verify": lambda: auth.verify_password(PASSWORD, password_hash),
+        f"task.serialize x{TASK_COUNT}": lambda: [serialize_task(task, assignee_names) for task in tasks],
+        f"json.render x{TASK_COUNT} (stdlib)": lambda: response.render(payload),
+    }
+
+    # Hot directory lookups: ORM query built per request vs cached statement
+    db = make_directory_session()
+    benchmarks.update({
+        "query.user_by_id (orm)": lambda: db.query(models.User).filter(models.User.id == 1).first(),
+        "query.user_by_id (statement)": lambda: db.scalars(statements.user_by_id(1)).first(),
+        "query.user_by_email (orm)": lambda: db.query(models.User).filter(
+            models.User.email == "alex@example.com"
+        ).first(),
+        "query.user_by_email (statement)": lambda: db.scalars(
+            statements.user_by_email("alex@example.com")
+        ).first(),
+        "query.member_house (orm)": lambda: orm_member_house(db, 7, 1),
+        "query.member_house (statement)": lambda: db.execute(
+            statements.house_with_membership(7, 1)
+        ).first(),
+    })
+
+    # Alternative backends, side by side
+    try:
+        import jwt as pyjwt
+        claims = {"exp": datetime.utcnow() + timedelta(days=1), "sub": "42"}
+        pyjwt_token = pyjwt.encode(claims, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+        benchmarks["jwt.encode (PyJWT)"] = lambda: pyjwt.encode(
+            claims, settings.SECRET_KEY, algorithm=settings.ALGORITHM
+        )
+        benchmarks["jwt.decode (PyJWT)"] = lambda: pyjwt.decode(
+            pyjwt_token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+        )
+    except ImportError:
+        pass
+    try:
+        import orjson
+        benchmarks[f"json.render x{TASK_COUNT} (orjson)"] = lambda: orjson.dumps(payload)
+    except ImportError:
+        pass
+    try:
+        import ujson
+        benchmarks[f"json.render x{TASK_COUNT} (ujson)"] = lambda: ujson.dumps(payload, ensure_ascii=False)
+    except ImportError:
+        pass
+
+    return benchmarks
+
+
+def reference():
+    """Fixed interpreter work that the other timings are relative to"""
+    return sum(i * i for i in range(1000))
+
+
+def _calls_per_run(timer):
+    number, elapsed = timer.autorange()
+    return max(1, round(number * RUN_SECONDS / elapsed))
+
+
+def measure(func, repeat):
+    """
+    Best time per call in microseconds of `func` and of the reference loop,
+    over `repeat` short runs of each taken in turn
+    """
+    timer, reference_timer = timeit.Timer(func), timeit.Timer(reference)
+    number, reference_number = _calls_per_run(timer), _calls_per_run(reference_timer)
+    best = reference_best = float("inf")
+    for _ in range(repeat):
+        reference_best = min(reference_best, reference_timer.timeit(reference_number) / reference_number)
+        best = min(best, timer.timeit(number) / number)
+    return best * 1e6, reference_best * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--save", action="store_true", help="record the results as the new baseline")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline file (default %(default)s)")
+    parser.add_argument(
+        "--threshold", type=float, help="allowed slowdown for every gated primitive (default: per primitive)"
+    )
+    parser.add_argument("--repeat", type=int, default=20, help="runs per primitive (default %(default)s)")
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    elif not args.save:
+        print(f"❌ No baseline at {args.baseline}, record one with --save")
+        sys.exit(1)
+
+    results = {}
+    regressions = []
+    print(f"{'primitive':<34}{'us/call':>12}{'x ref':>10}{'baseline':>10}{'change':>9}{'allowed':>9}")
+    for name, func in primitives().items():
+        elapsed, reference_time = measure(func, args.repeat)
+        results[name] = elapsed / reference_time
+        line = f"{name:<34}{elapsed:>12.2f}{results[name]:>10.3f}"
+        if name not in GATED:
+            line += f"{'':>28}  (not gated)"
+        elif name in baseline:
+            threshold = GATED[name] if args.threshold is None else args.threshold
+            change = results[name] / baseline[name] - 1
+            line += f"{baseline[name]:>10.3f}{change:>+9.1%}{threshold:>+9.0%}"
+            if change > threshold:
+                regressions.append(name)
+                line += "  REGRESSION"
+        print(line)
+
+    if args.save:
+        gated = {name: round(ratio, 4) for name, ratio in results.items() if name in GATED}
+        with open(args.baseline, "w") as file:
+            json.dump(gated, file, indent=2, sort_keys=True)
+            file.write("\n")
+        print(f"\n💾 Baseline saved to {args.baseline}")
+        return
+
+    missing = sorted(set(GATED) - set(baseline))
+    if missing:
+        print(f"\n❌ No baseline for {', '.join(missing)}, record one with --save")
+        sys.exit(1)
+    if regressions:
+        print(f"\n❌ {len(regressions)} primitive(s) slower than baseline by more than allowed")
+        sys.exit(1)
+    print("\n✅ No regressions")
+
+if __name__ == "__main__":
+    main()
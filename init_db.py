@@ -4,18 +4,27 @@ Database initialization script
 Run this to create all database tables
 """
 
-from app.db.session import engine
+from app.db.session import Base, engine
+from app.db.shards import SHARDED_TABLES, shard_router
 from app.models import user, house, house_member, task
 
 def init_db():
     """Create all database tables"""
     print("Creating database tables...")
 
-    # Create all tables
-    user.Base.metadata.create_all(bind=engine)
-    house.Base.metadata.create_all(bind=engine)
-    house_member.Base.metadata.create_all(bind=engine)
-    task.Base.metadata.create_all(bind=engine)
+    if shard_router.uses_directory:
+        # Create all tables
+        Base.metadata.create_all(bind=engine)
+    else:
+        # Directory tables in DATABASE_URL, task tables on every shard
+        sharded = [Base.metadata.tables[name] for name in SHARDED_TABLES]
+        directory = [
+            table for table in Base.metadata.sorted_tables
+            if table.name not in SHARDED_TABLES
+        ]
+        Base.metadata.create_all(bind=engine, tables=directory)
+        for shard_engine in shard_router.engines:
+            Base.metadata.create_all(bind=shard_engine, tables=sharded)
 
     print("✅ Database tables created successfully!")
 
@@ -91,6 +91,22 @@ def test_get_houses(token):
         print(f"❌ Get houses failed: {response.text}")
         return None
 
+def test_get_dashboard(token):
+    """Test getting the dashboard summary"""
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = requests.get(f"{BASE_URL}/dashboard", headers=headers)
+    print(f"\nGet Dashboard Response: {response.status_code}")
+
+    if response.status_code == 200:
+        result = response.json()
+        print("✅ Dashboard retrieved successfully!")
+        print(f"Dashboard: {result}")
+        return result
+    else:
+        print(f"❌ Get dashboard failed: {response.text}")
+        return None
+
 def main():
     print("🧪 Testing Flatmate API...")
 
@@ -110,6 +126,7 @@ def main():
     if house_id:
         # Test getting houses
         test_get_houses(token)
+        test_get_dashboard(token)
 
     print("\n🎉 API testing complete!")
 
@@ -0,0 +1,109 @@
+"""
+Shared fixtures: a fresh SQLite database per test, optionally with the tasks
+spread over several shard files
+"""
+import os
+import re
+import tempfile
+
+# Settings are read on import, so configure them before importing the app
+os.environ["SECRET_KEY"] = "test-secret-key"
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/directory.db"
+os.environ["SHARD_DATABASE_URLS"] = ""
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+import init_db
+from app.core import jobs
+from app.core.cache import response_cache
+from app.db.session import Base, SessionLocal, engine
+from app.db.shards import shard_router
+from app.main import app
+
+SHARD_COUNT = 3
+
+
+@pytest.fixture(autouse=True)
+def database():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    response_cache.backend.clear()
+    yield engine
+
+
+@pytest.fixture
+def shards(tmp_path, monkeypatch):
+    """
+    Tasks on SHARD_COUNT SQLite files, as with `SHARD_DATABASE_URLS`
+    """
+    engines = [
+        create_engine(f"sqlite:///{tmp_path}/shard{shard}.db") for shard in range(SHARD_COUNT)
+    ]
+    monkeypatch.setattr(shard_router, "engines", engines)
+    monkeypatch.setattr(shard_router, "sessionmakers", [
+        sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=shard_engine)
+        for shard_engine in engines
+    ])
+    Base.metadata.drop_all(bind=engine)
+    init_db.init_db()
+    yield engines
+    for shard_engine in engines:
+        shard_engine.dispose()
+
+
+@pytest.fixture
+def statements():
+    """
+    (verb, table) of every statement executed, e.g. ("INSERT", "tasks")
+    """
+    executed = []
+
+    def record(connection, cursor, statement, parameters, context, executemany):
+        verb, rest = statement.split(None, 1)
+        if verb == "SELECT":
+            # The outermost FROM comes last, after any subqueries in the columns
+            table = re.findall(r"FROM (\w+)", rest)[-1]
+        else:
+            table = re.match(r"(?:INTO |FROM )?(\w+)", rest).group(1)
+        executed.append((verb, table))
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(engine, "before_cursor_execute", record)
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def register(client):
+    """
+    Register a user and return their auth headers
+    """
+    def register(email: str, name: str = "Flatmate", password: str = "password") -> dict:
+        response = client.post(
+            "/auth/register", json={"name": name, "email": email, "password": password}
+        )
+        assert response.status_code == 200, response.text
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return register
+
+
+@pytest.fixture
+def run_jobs():
+    """
+    Run queued background jobs until none is left, as `python -m app.worker` would
+    """
+    def run_jobs() -> None:
+        db = SessionLocal()
+        try:
+            while (job := jobs.claim_job(db, jobs.registered_kinds())) is not None:
+                jobs.run_job(job.id, job.attempts)
+        finally:
+            db.close()
+    return run_jobs
@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+from sqlalchemy import insert, select
+from app import models
+from app.core.archiver import archive_completed_tasks
+from app.db.session import SessionLocal
+
+# Archive everything completed up to now
+NOW = timedelta(seconds=-1)
+
+
+def create_task(client, headers, house_id, title, complete=True) -> int:
+    task_id = client.post("/tasks/create", params={"title": title, "house_id": house_id}, headers=headers).json()["id"]
+    if complete:
+        assert client.post("/tasks/complete", params={"task_id": task_id}, headers=headers).status_code == 200
+    return task_id
+
+
+def test_archived_task_ids_are_not_reused(client, register):
+    alice = register("alice@example.com", "Alice")
+    house_id = client.post("/houses/create", json={"name": "Home"}, headers=alice).json()["id"]
+    first = create_task(client, alice, house_id, "Dishes")
+    assert archive_completed_tasks(older_than=NOW) == 1
+
+    second = create_task(client, alice, house_id, "Laundry")
+    assert second > first
+    assert archive_completed_tasks(older_than=NOW) == 1
+
+
+def test_archiver_skips_ids_already_in_the_archive(client, register):
+    alice = register("alice@example.com", "Alice")
+    house_id = client.post("/houses/create", json={"name": "Home"}, headers=alice).json()["id"]
+    reused = create_task(client, alice, house_id, "Dishes")
+    other = create_task(client, alice, house_id, "Laundry")
+    # An older task archived under the same id, as SQLite could hand out before AUTOINCREMENT
+    db = SessionLocal()
+    db.execute(insert(models.ArchivedTask).values(
+        id=reused, title="Old", house_id=house_id, priority_level=2, completed_at=datetime.utcnow()
+    ))
+    db.commit()
+
+    assert archive_completed_tasks(older_than=NOW, batch_size=1) == 1
+    assert db.scalars(select(models.Task.id)).all() == [reused]
+    assert other in db.scalars(select(models.ArchivedTask.id)).all()
+    db.close()
@@ -0,0 +1,44 @@
+from passlib.context import CryptContext
+from sqlalchemy import select, update
+from app import models
+from app.db.session import SessionLocal
+
+PASSWORD = "p" * 50
+
+
+def login(client, password):
+    return client.post("/auth/login", json={"username": "alice@example.com", "password": password})
+
+
+def stored_user() -> models.User:
+    db = SessionLocal()
+    try:
+        return db.scalars(select(models.User).where(models.User.email == "alice@example.com")).one()
+    finally:
+        db.close()
+
+
+def test_new_hashes_need_the_full_password(client, register):
+    register("alice@example.com", "Alice", password=PASSWORD)
+    assert not stored_user().password_truncated
+
+    assert login(client, PASSWORD + "EXTRA").status_code == 400
+    assert login(client, PASSWORD).status_code == 200
+
+
+def test_legacy_truncated_hash_is_replaced_on_login(client, register):
+    register("alice@example.com", "Alice")
+    full_password = PASSWORD + "and more"
+    db = SessionLocal()
+    db.execute(update(models.User).values(
+        password_hash=CryptContext(schemes=["pbkdf2_sha256"]).hash(full_password[:50]),
+        password_truncated=True
+    ))
+    db.commit()
+    db.close()
+
+    assert login(client, full_password).status_code == 200
+    user = stored_user()
+    assert not user.password_truncated
+    assert login(client, PASSWORD + "something else").status_code == 400
+    assert login(client, full_password).status_code == 200
@@ -0,0 +1,74 @@
+import asyncio
+from app.core.cache import MemoryCacheBackend, ResponseCache, response_cache
+
+
+def make_cache() -> ResponseCache:
+    return ResponseCache(MemoryCacheBackend(max_entries=100, ttl_seconds=60))
+
+
+def test_waiter_takes_over_from_a_cancelled_leader():
+    cache = make_cache()
+    calls = []
+
+    async def compute():
+        calls.append(len(calls))
+        await asyncio.sleep(0.05)
+        return f"value {len(calls)}", ["house:1"]
+
+    async def scenario():
+        leader = asyncio.create_task(cache.get_or_compute("key", compute))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.get_or_compute("key", compute))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        assert await waiter == "value 2"
+        assert leader.cancelled()
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+
+
+def test_concurrent_misses_share_one_computation_per_key():
+    cache = make_cache()
+    computed = []
+
+    async def compute(missing):
+        computed.extend(missing)
+        await asyncio.sleep(0.01)
+        return {key: (key.upper(), []) for key in missing}
+
+    async def scenario():
+        return await asyncio.gather(
+            cache.get_or_compute_many(["a", "b"], compute),
+            cache.get_or_compute_many(["b", "c"], compute)
+        )
+
+    first, second = asyncio.run(scenario())
+    assert first == {"a": "A", "b": "B"}
+    assert second == {"b": "B", "c": "C"}
+    assert sorted(computed) == ["a", "b", "c"]
+
+
+def test_house_tasks_are_cached_once_for_all_members(client, register):
+    alice = register("alice@example.com", "Alice")
+    bob = register("bob@example.com", "Bob")
+    eve = register("eve@example.com", "Eve")
+    house_id = client.post("/houses/create", json={"name": "Home"}, headers=alice).json()["id"]
+    client.post("/houses/invite", params={"house_id": house_id, "email": "bob@example.com"}, headers=alice)
+    client.post("/tasks/create", params={"title": "Dishes", "house_id": house_id}, headers=alice)
+
+    assert [task["title"] for task in client.get("/tasks/today", headers=alice).json()] == ["Dishes"]
+    key = f"tasks:house:{house_id}"
+    cached = response_cache.backend.get(key)
+    assert [task["title"] for task in cached] == ["Dishes"]
+
+    # Bob is served the same entry; Eve is still refused with the entry cached
+    assert client.get("/tasks/today", params={"house_id": house_id}, headers=bob).json() == cached
+    assert response_cache.backend.get(key) is cached
+    assert client.get("/tasks/today", params={"house_id": house_id}, headers=eve).status_code == 403
+
+    # House summaries are shared too, with is_creator filled in per member
+    [alice_house] = client.get("/houses/user", headers=alice).json()
+    [bob_house] = client.get("/houses/user", headers=bob).json()
+    assert alice_house["is_creator"] is True
+    assert bob_house == {**alice_house, "is_creator": False}
@@ -0,0 +1,69 @@
+import pytest
+
+# US daylight saving time started on 2024-03-10 at 07:00 UTC
+DEADLINES = {
+    "before midnight EST": "2024-03-10T04:30:00Z",
+    "after midnight EST": "2024-03-10T05:30:00Z",
+    "before midnight EDT": "2024-03-11T03:30:00Z",
+    "after midnight EDT": "2024-03-11T04:30:00Z",
+}
+
+
+@pytest.fixture
+def house(client, register):
+    headers = register("alice@example.com", "Alice")
+    house_id = client.post("/houses/create", json={"name": "Home"}, headers=headers).json()["id"]
+    return house_id, headers
+
+
+def create_task(client, house, title, deadline):
+    house_id, headers = house
+    return client.post(
+        "/tasks/create", params={"title": title, "house_id": house_id, "deadline": deadline}, headers=headers
+    ).json()["id"]
+
+
+def calendar(client, house, **params):
+    return client.get("/tasks/calendar", params=params, headers=house[1])
+
+
+def test_days_follow_the_local_offset_across_a_dst_change(client, house):
+    ids = {title: create_task(client, house, title, deadline) for title, deadline in DEADLINES.items()}
+    client.post("/tasks/complete", params={"task_id": ids["before midnight EDT"]}, headers=house[1])
+
+    response = calendar(
+        client, house, **{"from": "2024-03-09", "to": "2024-03-11", "tz": "America/New_York", "include_ids": True}
+    )
+    assert response.status_code == 200
+    assert response.json()["days"] == [
+        {"date": "2024-03-09", "open": 1, "completed": 0, "overdue": 1,
+         "task_ids": [ids["before midnight EST"]]},
+        {"date": "2024-03-10", "open": 1, "completed": 1, "overdue": 1,
+         "task_ids": [ids["after midnight EST"], ids["before midnight EDT"]]},
+        {"date": "2024-03-11", "open": 1, "completed": 0, "overdue": 1,
+         "task_ids": [ids["after midnight EDT"]]},
+    ]
+
+
+def test_days_in_utc_without_ids(client, house):
+    for title, deadline in DEADLINES.items():
+        create_task(client, house, title, deadline)
+    create_task(client, house, "Later", "2099-03-10T12:00:00Z")
+
+    days = calendar(client, house, **{"from": "2024-03-10", "to": "2024-03-11"}).json()["days"]
+    assert days == [
+        {"date": "2024-03-10", "open": 2, "completed": 0, "overdue": 2},
+        {"date": "2024-03-11", "open": 2, "completed": 0, "overdue": 2},
+    ]
+    # Tasks due in the future aren't overdue
+    days = calendar(client, house, **{"from": "2099-03-10", "to": "2099-03-10"}).json()["days"]
+    assert days == [{"date": "2099-03-10", "open": 1, "completed": 0, "overdue": 0}]
+
+
+@pytest.mark.parametrize("params", [
+    {"from": "2024-03-11", "to": "2024-03-10"},
+    {"from": "2024-01-01", "to": "2024-03-03"},
+    {"from": "2024-03-10", "to": "2024-03-11", "tz": "Mars/Olympus_Mons"},
+])
+def test_invalid_ranges_and_time_zones_are_rejected(client, house, params):
+    assert calendar(client, house, **params).status_code == 400
@@ -0,0 +1,36 @@
+import threading
+from app.core import changelog
+from app.db.session import SessionLocal
+
+
+def test_sync_cursor_never_passes_an_uncommitted_change(client, register):
+    alice = register("alice@example.com", "Alice")
+    house_id = client.post("/houses/create", json={"name": "Home"}, headers=alice).json()["id"]
+    cursor = client.get("/sync", headers=alice).json()["cursor"]
+
+    first, second = SessionLocal(), SessionLocal()
+    changelog.record_change(first, changelog.HOUSE, house_id, changelog.UPSERT, house_id=house_id)
+
+    def write_second():
+        changelog.record_change(second, changelog.TASK, 1, changelog.UPSERT, house_id=house_id)
+        second.commit()
+
+    writer = threading.Thread(target=write_second)
+    writer.start()
+    try:
+        # The second writer waits for the first, so nothing past it is visible yet
+        writer.join(timeout=0.5)
+        assert writer.is_alive()
+        response = client.get("/sync", params={"since": cursor}, headers=alice).json()
+        assert response["changes"] == []
+        assert response["cursor"] == cursor
+    finally:
+        first.commit()
+        writer.join()
+        first.close()
+        second.close()
+
+    response = client.get("/sync", params={"since": cursor}, headers=alice).json()
+    assert [(change["entity"], change["id"]) for change in response["changes"]] == [
+        ("house", house_id), ("task", 1)
+    ]
@@ -0,0 +1,33 @@
+"""
+The dashboard runs the same statements whatever the number of houses
+"""
+
+
+def dashboard_statements(client, register, statements, email, house_count):
+    headers = register(email)
+    for n in range(house_count):
+        house_id = client.post("/houses/create", json={"name": f"House {n}"}, headers=headers).json()["id"]
+        for title in ("Dishes", "Laundry"):
+            client.post("/tasks/create", params={
+                "title": title, "house_id": house_id, "assigned_to": email, "deadline": "2099-01-01T12:00:00Z"
+            }, headers=headers)
+
+    statements.clear()
+    response = client.get("/dashboard", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()) == house_count
+    assert all(len(house["upcoming_tasks"]) == 2 for house in response.json())
+    return list(statements)
+
+
+def test_dashboard_statements_do_not_grow_with_houses(client, register, statements):
+    one_house = dashboard_statements(client, register, statements, "alice@example.com", 1)
+    five_houses = dashboard_statements(client, register, statements, "bob@example.com", 5)
+    assert one_house == five_houses
+    assert one_house == [
+        ("SELECT", "users"),  # authentication
+        ("SELECT", "house_members"),  # houses, filtered by a membership subquery
+        ("SELECT", "tasks"),
+        ("SELECT", "tasks"),
+        ("SELECT", "users"),  # assignee names
+    ]
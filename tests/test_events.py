@@ -0,0 +1,79 @@
+import asyncio
+import json
+import pytest
+from sqlalchemy import select
+from app import models
+from app.core import events
+from app.core.cache import response_cache
+from app.core.config import settings
+from app.db.session import engine
+
+
+@pytest.fixture
+def bus(monkeypatch):
+    monkeypatch.setattr(settings, "EVENT_BUS_POLL_INTERVAL_SECONDS", 0.01)
+    bus = events.DatabaseEventBus()
+    received = []
+    bus.subscribe(received.append)
+    return bus, received
+
+
+def published():
+    with engine.connect() as connection:
+        return [json.loads(payload) for payload in connection.scalars(select(models.InvalidationEvent.payload))]
+
+
+async def poll_while(bus, publish):
+    """Run the bus's poll loop around `publish()`"""
+    task = asyncio.create_task(bus.run())
+    await asyncio.sleep(0.05)
+    publish()
+    await asyncio.sleep(0.1)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+
+def test_publish_stores_the_event_with_its_origin(bus):
+    bus, _ = bus
+    bus.publish({"type": "cache.invalidate", "house_ids": [1], "user_ids": []})
+    assert published() == [{"type": "cache.invalidate", "house_ids": [1], "user_ids": [], "origin": events.ORIGIN}]
+
+
+def test_events_of_other_processes_are_delivered(bus, monkeypatch):
+    bus, received = bus
+
+    def publish_from_another_process():
+        with monkeypatch.context() as patch:
+            patch.setattr(events, "ORIGIN", "other")
+            bus.publish({"type": "cache.invalidate", "house_ids": [1], "user_ids": [2]})
+
+    asyncio.run(poll_while(bus, publish_from_another_process))
+    assert received == [{"type": "cache.invalidate", "house_ids": [1], "user_ids": [2], "origin": "other"}]
+
+
+def test_a_process_skips_its_own_events(bus):
+    bus, received = bus
+    asyncio.run(poll_while(bus, lambda: bus.publish({"type": "cache.invalidate", "house_ids": [1], "user_ids": []})))
+    assert len(published()) == 1
+    assert received == []
+
+
+def test_events_published_before_start_are_not_replayed(bus):
+    bus, received = bus
+    events.DatabaseEventBus().publish({"type": "cache.invalidate", "house_ids": [1], "user_ids": []})
+    asyncio.run(poll_while(bus, lambda: None))
+    assert received == []
+
+
+def test_invalidation_events_evict_the_cache(client, register):
+    alice = register("alice@example.com", "Alice")
+    house_id = client.post("/houses/create", json={"name": "Home"}, headers=alice).json()["id"]
+    assert client.get("/houses/user", headers=alice).json()[0]["name"] == "Home"
+
+    # Another process renames the house and broadcasts the invalidation
+    with engine.begin() as connection:
+        connection.execute(models.House.__table__.update().values(name="Flat"))
+    assert client.get("/houses/user", headers=alice).json()[0]["name"] == "Home"
+    response_cache.handle_event({"type": "cache.invalidate", "house_ids": [house_id], "user_ids": [], "origin": "other"})
+    assert client.get("/houses/user", headers=alice).json()[0]["name"] == "Flat"
@@ -0,0 +1,18 @@
+def test_background_delete_does_not_leak_tasks_to_a_new_house(client, register, run_jobs):
+    alice = register("alice@example.com", "Alice")
+    bob = register("bob@example.com", "Bob")
+    old_house = client.post("/houses/create", json={"name": "Old"}, headers=alice).json()["id"]
+    client.post("/tasks/create", params={"title": "A secret", "house_id": old_house}, headers=alice)
+
+    response = client.delete("/houses/delete", params={"house_id": old_house, "background": True}, headers=alice)
+    assert response.status_code == 202
+
+    new_house = client.post("/houses/create", json={"name": "New"}, headers=bob).json()["id"]
+    assert new_house != old_house
+    client.post("/tasks/create", params={"title": "Bob's task", "house_id": new_house}, headers=bob)
+    titles = [task["title"] for task in client.get("/tasks/today", headers=bob).json()]
+    assert titles == ["Bob's task"]
+
+    run_jobs()
+    titles = [task["title"] for task in client.get("/tasks/today", headers=bob).json()]
+    assert titles == ["Bob's task"]
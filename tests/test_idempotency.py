@@ -0,0 +1,28 @@
+import uuid
+from datetime import timedelta
+from app.core import auth
+
+
+def test_retry_with_a_refreshed_token_is_replayed(client, register):
+    alice = register("alice@example.com", "Alice")
+    user_id = auth.decode_access_token(alice["Authorization"].split()[1])["sub"]
+    refreshed = {"Authorization": f"Bearer {auth.create_access_token(user_id, timedelta(minutes=5))}"}
+    assert refreshed != alice
+    key = {"Idempotency-Key": str(uuid.uuid4())}
+
+    first = client.post("/houses/create", json={"name": "Home"}, headers={**alice, **key})
+    retry = client.post("/houses/create", json={"name": "Home"}, headers={**refreshed, **key})
+    assert retry.headers.get("idempotent-replayed") == "true"
+    assert retry.json() == first.json()
+    assert len(client.get("/houses/user", headers=alice).json()) == 1
+
+
+def test_keys_are_not_shared_between_users(client, register):
+    alice = register("alice@example.com", "Alice")
+    bob = register("bob@example.com", "Bob")
+    key = {"Idempotency-Key": str(uuid.uuid4())}
+
+    first = client.post("/houses/create", json={"name": "Home"}, headers={**alice, **key})
+    other = client.post("/houses/create", json={"name": "Home"}, headers={**bob, **key})
+    assert "idempotent-replayed" not in other.headers
+    assert other.json()["id"] != first.json()["id"]
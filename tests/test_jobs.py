@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+from sqlalchemy import func, select, update
+from app import models
+from app.core import jobs
+from app.db.session import SessionLocal
+
+
+def count_tasks() -> int:
+    db = SessionLocal()
+    try:
+        return db.scalar(select(func.count(models.Task.id)))
+    finally:
+        db.close()
+
+
+def test_retried_import_does_not_duplicate_tasks(client, register, run_jobs):
+    alice = register("alice@example.com", "Alice")
+    house_id = client.post("/houses/create", json={"name": "Home"}, headers=alice).json()["id"]
+    response = client.post("/tasks/import", json={
+        "house_id": house_id,
+        "tasks": [{"title": "Dishes"}, {"title": "Laundry"}]
+    }, headers=alice)
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+
+    run_jobs()
+    assert count_tasks() == 2
+
+    # The worker committed the import but lost its claim before recording the
+    # outcome, so another worker runs the job again
+    db = SessionLocal()
+    db.execute(update(models.Job).where(models.Job.id == job_id).values(status=jobs.RUNNING, attempts=2))
+    db.commit()
+    db.close()
+    jobs.run_job(job_id, 2)
+
+    assert count_tasks() == 2
+    job = client.get(f"/jobs/{job_id}", headers=alice).json()
+    assert job["status"] == jobs.SUCCEEDED
+
+
+def test_periodic_task_runs_once_per_interval_across_workers():
+    first, second = SessionLocal(), SessionLocal()
+    try:
+        assert jobs.claim_periodic(first, "tasks.archive", 60)
+        # Another worker checking within the interval leaves it alone
+        assert not jobs.claim_periodic(second, "tasks.archive", 60)
+        assert not jobs.claim_periodic(first, "tasks.archive", 60)
+
+        second.execute(update(models.PeriodicRun).values(next_run_at=datetime.utcnow() - timedelta(seconds=1)))
+        second.commit()
+        assert jobs.claim_periodic(second, "tasks.archive", 60)
+        assert not jobs.claim_periodic(first, "tasks.archive", 60)
+    finally:
+        first.close()
+        second.close()
@@ -0,0 +1,73 @@
+from types import SimpleNamespace
+import pytest
+from app.core import limiter
+from app.core.limiter import READS, AdaptiveLimit
+
+
+def make_limit(initial=10, tolerance=2.0, backoff_ratio=0.5) -> AdaptiveLimit:
+    return AdaptiveLimit(initial, min_limit=2, max_limit=100, tolerance=tolerance, backoff_ratio=backoff_ratio)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=100.0)
+    monkeypatch.setattr(limiter, "time", SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+
+def fill(limit: AdaptiveLimit, count: int) -> None:
+    for _ in range(count):
+        assert limit.try_acquire()
+
+
+def test_requests_over_the_limit_are_rejected():
+    limit = make_limit(initial=3)
+    fill(limit, 3)
+    assert not limit.try_acquire()
+    assert (limit.accepted, limit.rejected) == (3, 1)
+    limit.release(0.01)
+    assert limit.try_acquire()
+
+
+def test_backs_off_at_most_once_per_round_trip(clock):
+    limit = make_limit()
+    fill(limit, 8)
+    limit.release(0.1)  # Sets the baseline
+    limit.release(3.0)  # Much slower: cut the limit
+    assert limit.limit == 5
+    limit.release(3.0)  # Admitted under the old limit, within the same round trip
+    assert limit.limit == 5
+
+    clock.value += limit.latency
+    limit.release(3.0)
+    assert limit.limit == 2.5
+
+
+def test_grows_only_while_the_limit_is_in_use(clock):
+    limit = make_limit()
+    fill(limit, 2)
+    limit.release(0.1)
+    limit.release(0.1)  # Two in flight out of ten
+    assert limit.limit == 10
+
+    fill(limit, 6)
+    limit.release(0.1)  # Six in flight
+    assert limit.limit == pytest.approx(10.1)
+
+
+def test_middleware_sheds_load_with_a_fast_503(client, monkeypatch):
+    limit = make_limit(initial=2)
+    monkeypatch.setitem(limiter.limits, READS, limit)
+    fill(limit, 2)
+
+    response = client.get("/houses/user")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    # Health checks and metrics are never shed
+    assert client.get("/health").status_code == 200
+    assert client.get("/metrics").json()["concurrency_limits"][READS]["rejected"] == 1
+
+    limit.in_flight = 0
+    # Admitted again; fails authentication instead
+    assert client.get("/houses/user").status_code == 403
+    assert limit.in_flight == 0
@@ -0,0 +1,119 @@
+from sqlalchemy import inspect, text
+from app.db.migrations import add_house_autoincrement, migrate_task_schema
+from app.db.session import engine
+
+LEGACY_TASKS = """
+    CREATE TABLE tasks (
+        id INTEGER PRIMARY KEY, title VARCHAR NOT NULL, description VARCHAR,
+        house_id INTEGER NOT NULL, assigned_to VARCHAR, deadline DATETIME,
+        priority VARCHAR, completed BOOLEAN, completed_at DATETIME,
+        created_at DATETIME DEFAULT (CURRENT_TIMESTAMP), updated_at DATETIME
+    )
+"""
+
+
+def insert_legacy_task(connection, task_id, house_id, priority, assigned_to):
+    connection.execute(text(
+        "INSERT INTO tasks (id, title, house_id, priority, assigned_to) "
+        "VALUES (:id, 'Task', :house_id, :priority, :assigned_to)"
+    ), {"id": task_id, "house_id": house_id, "priority": priority, "assigned_to": assigned_to})
+
+
+def tasks():
+    with engine.connect() as connection:
+        return connection.execute(text("SELECT * FROM tasks ORDER BY id")).mappings().all()
+
+
+def test_expand_keeps_legacy_columns_and_contract_drops_them(client, register):
+    register("alice@example.com", "Alice")
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE tasks"))
+        connection.execute(text("DROP TABLE tasks_archive"))
+        connection.execute(text(LEGACY_TASKS))
+        connection.execute(text("INSERT INTO houses (id, name, creator_id) VALUES (1, 'Home', 1)"))
+        insert_legacy_task(connection, 1, 1, "high", "Alice")
+        insert_legacy_task(connection, 2, 1, "low", "Mom")
+
+    # A missing tasks_archive table is skipped
+    unresolved = migrate_task_schema()
+    assert unresolved == {(1, "Mom"): 1}
+    rows = tasks()
+    assert [(row["priority_level"], row["assignee_id"]) for row in rows] == [(3, 1), (1, None)]
+    # Old instances keep reading their columns
+    assert [(row["priority"], row["assigned_to"]) for row in rows] == [("high", "Alice"), ("low", "Mom")]
+
+    # An old instance inserts a task during the rollout
+    with engine.begin() as connection:
+        insert_legacy_task(connection, 3, 1, "low", "alice@example.com")
+
+    migrate_task_schema(contract=True)
+    rows = tasks()
+    assert [(row["priority_level"], row["assignee_id"]) for row in rows] == [(3, 1), (1, None), (1, 1)]
+    columns = {column["name"] for column in inspect(engine).get_columns("tasks")}
+    assert not columns & {"priority", "assigned_to"}
+
+
+def test_sqlite_tables_are_rebuilt_so_ids_are_not_reused(client, register):
+    alice = register("alice@example.com", "Alice")
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE houses"))
+        connection.execute(text("DROP TABLE tasks"))
+        connection.execute(text(
+            "CREATE TABLE houses (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL, description VARCHAR, "
+            "creator_id INTEGER NOT NULL REFERENCES users (id), created_at DATETIME DEFAULT (CURRENT_TIMESTAMP), "
+            "updated_at DATETIME)"
+        ))
+        connection.execute(text(LEGACY_TASKS))
+        connection.execute(text("CREATE INDEX ix_houses_id ON houses (id)"))
+        connection.execute(text("INSERT INTO houses (id, name, creator_id) VALUES (1, 'Home', 1)"))
+        insert_legacy_task(connection, 1, 1, "high", None)
+        # House 2 was deleted in the background; its task awaits the purge job
+        insert_legacy_task(connection, 2, 2, "low", None)
+        connection.execute(text(
+            "INSERT INTO tasks_archive (id, title, house_id, priority_level, completed) VALUES (3, 'Archived', 1, 2, 1)"
+        ))
+
+    migrate_task_schema()
+    add_house_autoincrement(engine)
+    assert {index["name"] for index in inspect(engine).get_indexes("houses")} == {"ix_houses_id"}
+
+    house_id = client.post("/houses/create", json={"name": "New"}, headers=alice).json()["id"]
+    assert house_id == 3
+    assert client.get("/tasks/today", params={"house_id": house_id}, headers=alice).json() == []
+    task_id = client.post("/tasks/create", params={"title": "New", "house_id": 1}, headers=alice).json()["id"]
+    assert task_id == 4
+    # Running it again changes nothing
+    migrate_task_schema()
+    add_house_autoincrement(engine)
+    assert client.post("/houses/create", json={"name": "Newer"}, headers=alice).json()["id"] == 4
+
+
+def test_new_instances_fill_legacy_columns_until_contract(client, register):
+    alice = register("alice@example.com", "Alice")
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE tasks"))
+        connection.execute(text(LEGACY_TASKS))
+        connection.execute(text("INSERT INTO houses (id, name, creator_id) VALUES (1, 'Home', 1)"))
+    migrate_task_schema()
+
+    # Names match case-insensitively, as in the migration
+    response = client.post("/tasks/create", params={
+        "title": "Dishes", "house_id": 1, "priority": "high", "assigned_to": "alice"
+    }, headers=alice)
+    assert response.status_code == 200
+    task_id = response.json()["id"]
+    assert [(row["priority"], row["assigned_to"]) for row in tasks()] == [("high", "Alice")]
+
+    client.put("/tasks/update", params={"task_id": task_id, "priority": "low"}, headers=alice)
+    assert [(row["priority"], row["assigned_to"]) for row in tasks()] == [("low", "Alice")]
+
+    # Rows of old instances keep their own values until converted
+    with engine.begin() as connection:
+        insert_legacy_task(connection, 2, 1, "high", "Mom")
+    assert [(row["priority"], row["assigned_to"], row["priority_level"]) for row in tasks()] == [
+        ("low", "Alice", 1), ("high", "Mom", None)
+    ]
+
+    migrate_task_schema(contract=True)
+    assert client.post("/tasks/create", params={"title": "Laundry", "house_id": 1}, headers=alice).status_code == 200
+    assert [row["priority_level"] for row in tasks()] == [1, 3, 2]
@@ -0,0 +1,43 @@
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app import models
+from app.db.shards import shard_router
+from tests.conftest import SHARD_COUNT
+
+
+def test_tasks_are_routed_to_their_house_shard(client, register, shards):
+    alice = register("alice@example.com", "Alice")
+    house_ids = [
+        client.post("/houses/create", json={"name": f"House {n}"}, headers=alice).json()["id"]
+        for n in range(SHARD_COUNT)
+    ]
+    task_ids = {
+        house_id: client.post(
+            "/tasks/create", params={"title": f"Task of {house_id}", "house_id": house_id}, headers=alice
+        ).json()["id"]
+        for house_id in house_ids
+    }
+    cursor = client.get("/sync", headers=alice).json()["cursor"]
+
+    # Each task lives only on its house's shard, under its local id
+    for house_id, task_id in task_ids.items():
+        shard, local_id = shard_router.split_task_id(task_id)
+        assert shard == house_id % SHARD_COUNT
+        for shard_engine in shards:
+            with Session(shard_engine) as session:
+                titles = session.scalars(select(models.Task.title).where(models.Task.house_id == house_id)).all()
+            assert titles == ([f"Task of {house_id}"] if shard_engine is shards[shard] else [])
+
+    # Reads fan out across the shards
+    today = client.get("/tasks/today", headers=alice).json()
+    assert sorted(task["id"] for task in today) == sorted(task_ids.values())
+
+    # Writes and sync find tasks by their public ids
+    for house_id, task_id in task_ids.items():
+        response = client.put("/tasks/update", params={"task_id": task_id, "title": "Renamed"}, headers=alice)
+        assert response.status_code == 200
+        assert response.json()["id"] == task_id
+    changes = client.get("/sync", params={"since": cursor}, headers=alice).json()["changes"]
+    assert {change["id"]: change["data"]["title"] for change in changes} == {
+        task_id: "Renamed" for task_id in task_ids.values()
+    }
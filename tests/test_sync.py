@@ -0,0 +1,20 @@
+def test_invitee_receives_tasks_logged_before_joining(client, register):
+    alice = register("alice@example.com", "Alice")
+    bob = register("bob@example.com", "Bob")
+    house_id = client.post("/houses/create", json={"name": "Home"}, headers=alice).json()["id"]
+    task_id = client.post("/tasks/create", params={"title": "Dishes", "house_id": house_id}, headers=alice).json()["id"]
+
+    # Bob's cursor is already past the task's change log entry
+    cursor = client.get("/sync", headers=bob).json()["cursor"]
+    assert client.post("/houses/invite", params={"house_id": house_id, "email": "bob@example.com"}, headers=alice).status_code == 200
+
+    response = client.get("/sync", params={"since": cursor}, headers=bob).json()
+    assert not response["reset"]
+    changes = {(change["entity"], change["id"]): change for change in response["changes"]}
+    assert changes[("house", house_id)]["op"] == "upsert"
+    assert changes[("task", task_id)]["op"] == "upsert"
+    assert changes[("task", task_id)]["data"]["title"] == "Dishes"
+
+    # Later syncs only carry new changes
+    response = client.get("/sync", params={"since": response["cursor"]}, headers=bob).json()
+    assert response["changes"] == []
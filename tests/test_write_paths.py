@@ -0,0 +1,32 @@
+"""
+Statement counts of the write endpoints: each writes with INSERT/UPDATE ...
+RETURNING and never re-selects what it just wrote
+"""
+
+
+def test_register_is_a_single_insert(client, statements):
+    response = client.post("/auth/register", json={"name": "Alice", "email": "alice@example.com", "password": "pw"})
+    assert response.status_code == 200
+    assert statements == [("INSERT", "users")]
+
+
+def test_write_statement_counts(client, register, statements):
+    alice = register("alice@example.com", "Alice")
+    authenticate = ("SELECT", "users")
+
+    statements.clear()
+    house_id = client.post("/houses/create", json={"name": "Home"}, headers=alice).json()["id"]
+    assert statements == [authenticate, ("INSERT", "houses"), ("INSERT", "house_members"), ("INSERT", "change_log")]
+
+    statements.clear()
+    task_id = client.post("/tasks/create", params={"title": "Dishes", "house_id": house_id}, headers=alice).json()["id"]
+    assert statements == [authenticate, ("SELECT", "houses"), ("INSERT", "tasks"), ("INSERT", "change_log")]
+
+    task_write = [authenticate, ("SELECT", "tasks"), ("SELECT", "houses"), ("UPDATE", "tasks"), ("INSERT", "change_log")]
+    statements.clear()
+    assert client.put("/tasks/update", params={"task_id": task_id, "title": "Laundry"}, headers=alice).status_code == 200
+    assert statements == task_write
+
+    statements.clear()
+    assert client.post("/tasks/complete", params={"task_id": task_id}, headers=alice).status_code == 200
+    assert statements == task_write